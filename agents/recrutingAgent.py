@@ -46,11 +46,12 @@ def get_redis_client():
         print("Cannot connect to Redis")
 
 def get_interview_request(user_id: str):
-    key = f"user:{user_id}"
-    value = redis_client.get(key)
-    if value:
-        interview = json.loads(value)
-        return interview
+    # Latest request id is the top of the user's sorted set (see calls/interview_store.py)
+    request_ids = redis_client.zrevrange(f"interview:user:{user_id}", 0, 0)
+    if request_ids:
+        interview = redis_client.hgetall(f"interview:request:{request_ids[0]}")
+        if interview:
+            return interview
 
 
 async def get_user_profile(identity: str):
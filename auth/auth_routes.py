@@ -1,39 +1,127 @@
+import logging
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from passlib.context import CryptContext
-from database import get_db
+from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import get_async_db
+from ratelimit import body_email, rate_limit
+from config import settings
 from models import User
-from schemas import UserCreate, UserLogin, Token
-from .jwt_handler import create_access_token
+from schemas import RefreshRequest, UserCreate, UserLogin, Token
+from .jwt_handler import create_access_token, create_refresh_token, verify_token
+from .passwords import PasswordHasherBusy, password_hasher
+from .revocation import revocation_store
 
 from sqlalchemy import select
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login", auto_error=False)
+
+
+def issue_tokens(username: str, user_id: int, family: Optional[str] = None) -> dict:
+    claims = {"sub": username, "uid": user_id}
+    return {
+        "access_token": create_access_token(data=claims),
+        "refresh_token": create_refresh_token(data=claims, family=family),
+        "token_type": "bearer",
+    }
+
+
+def token_store_unavailable() -> HTTPException:
+    return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Token store unavailable")
+
+
+def hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many sign-in attempts in progress, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
 
-@router.post("/signup", response_model=Token)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
-    hashed_password = pwd_context.hash(user.password)
+@router.post(
+    "/signup",
+    response_model=Token,
+    dependencies=[Depends(rate_limit("signup-ip", settings.RATE_LIMIT_SIGNUP_PER_IP))],
+)
+async def signup(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     stmt = select(User).where(User.email.in_([user.email]))
-    db_user = db.scalar(stmt)
+    db_user = await db.scalar(stmt)
     
     if db_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="User already exists!"
         )
+
+    try:
+        hashed_password = await password_hasher.hash(user.password)
+    except PasswordHasherBusy:
+        raise hasher_busy()
     
     new_db_user = User(username=user.username, email=user.email, hashed_password=hashed_password)
     db.add(new_db_user)
-    db.commit()
-    db.refresh(new_db_user)
-    access_token = create_access_token(data={"sub": new_db_user.username})
-    return {"access_token": access_token, "token_type": "bearer"}
-
-@router.post("/login", response_model=Token)
-def login(user: UserLogin, db: Session = Depends(get_db)):
-    db_user = db.query(User).filter(User.email == user.email).first()
-    if not db_user or not pwd_context.verify(user.password, db_user.hashed_password):
+    await db.commit()
+    await db.refresh(new_db_user)
+    return issue_tokens(new_db_user.username, new_db_user.id)
+
+@router.post(
+    "/login",
+    response_model=Token,
+    # Rejected before any bcrypt work: per IP against spraying, per email against guessing one account
+    dependencies=[
+        Depends(rate_limit("login-ip", settings.RATE_LIMIT_LOGIN_PER_IP)),
+        Depends(rate_limit("login-email", settings.RATE_LIMIT_LOGIN_PER_EMAIL, key=body_email)),
+    ],
+)
+async def login(user: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    db_user = (await db.scalars(select(User).where(User.email == user.email))).first()
+    if not db_user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
-    access_token = create_access_token(data={"sub": db_user.username})
-    return {"access_token": access_token, "token_type": "bearer"}
+    try:
+        valid, new_hash = await password_hasher.verify(user.password, db_user.hashed_password)
+    except PasswordHasherBusy:
+        raise hasher_busy()
+    if not valid:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials")
+    if new_hash:
+        # BCRYPT_ROUNDS changed since this hash was made; store it at the current cost
+        db_user.hashed_password = new_hash
+        await db.commit()
+    return issue_tokens(db_user.username, db_user.id)
+
+
+@router.post("/refresh", response_model=Token)
+async def refresh(request: RefreshRequest):
+    # Rotation: each refresh token works once and is exchanged for a new pair,
+    # at the cost of one Redis round trip instead of a bcrypt verify
+    payload = verify_token(request.refresh_token, token_type="refresh")
+    if not payload or "jti" not in payload or "fam" not in payload:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired refresh token")
+    try:
+        fresh = await revocation_store.use_refresh_token(payload)
+    except Exception:
+        logger.exception("Token store unavailable during refresh")
+        raise token_store_unavailable()
+    if not fresh:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token revoked")
+    return issue_tokens(payload["sub"], payload["uid"], family=payload["fam"])
+
+
+@router.post("/logout")
+async def logout(request: RefreshRequest, access_token: Optional[str] = Depends(optional_oauth2_scheme)):
+    # Ends the login's whole refresh chain, plus the access token it was sent with
+    payload = verify_token(request.refresh_token, token_type="refresh")
+    if not payload or "fam" not in payload:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired refresh token")
+    access_payload = verify_token(access_token) if access_token else None
+    try:
+        await revocation_store.revoke_family(payload["fam"])
+        if access_payload and "jti" in access_payload:
+            await revocation_store.revoke(access_payload["jti"], access_payload["exp"])
+    except Exception:
+        logger.exception("Token store unavailable during logout")
+        raise token_store_unavailable()
+    return {"message": "Logged out"}
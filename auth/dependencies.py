@@ -1,25 +1,91 @@
 # auth/dependencies.py
+import logging
+from typing import Optional
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, object_session
 from .jwt_handler import verify_token
-from database import get_db
+from .revocation import revocation_store
+from cache import Cache
+from config import settings
+from database import get_async_db
 from models import User
+from redis_pool import redis_pool
 import schemas
 
+logger = logging.getLogger(__name__)
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> schemas.UserCreate:
+# Resolved users by token subject, so authenticated requests skip the users query
+principal_cache = Cache("principal", ttl=settings.PRINCIPAL_CACHE_TTL)
+
+
+def principal_key(payload: dict) -> Optional[str]:
+    # Tokens issued before `uid` was added only carry the username
+    if payload.get("uid") is not None:
+        return f"uid:{payload['uid']}"
+    if payload.get("sub"):
+        return f"sub:{payload['sub']}"
+    return None
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)
+) -> schemas.CurrentUser:
     # Decode and verify the token
     payload = verify_token(token)
-    if not payload:
+    key = principal_key(payload) if payload else None
+    if not key:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid or expired token")
-    
-    # Fetch the user from the database
-    username: str = payload.get("sub")
-    user = db.query(User).filter(User.username == username).first()
-    if user is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    
-    return user
+
+    # Logged out access tokens; while Redis is down they stay valid until they expire
+    if payload.get("jti") and redis_pool.healthy:
+        try:
+            revoked = await revocation_store.is_revoked(payload["jti"])
+        except Exception as e:
+            logger.warning("Could not check token revocation: %r", e)
+            revoked = False
+        if revoked:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token has been revoked")
+
+    principal = await principal_cache.get(key)
+    if principal is None:
+        # Fetch the user from the database, by primary key when the token has it
+        if payload.get("uid") is not None:
+            user = await db.get(User, int(payload["uid"]))
+        else:
+            user = (await db.scalars(select(User).where(User.username == payload["sub"]))).first()
+        if user is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        principal = {"id": user.id, "username": user.username, "email": user.email}
+        await principal_cache.set(key, principal)
+
+    return schemas.CurrentUser(**principal)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target):
+    # Collected per session and dropped from the cache once the change is committed
+    session = object_session(target)
+    if session is None:
+        return
+    keys = session.info.setdefault("changed_principals", set())
+    keys.add(f"uid:{target.id}")
+    keys.add(f"sub:{target.username}")
+    for old_username in inspect(target).attrs.username.history.deleted:
+        keys.add(f"sub:{old_username}")
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_principals(session):
+    for key in session.info.pop("changed_principals", ()):
+        principal_cache.invalidate(key)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_principals(session):
+    session.info.pop("changed_principals", None)
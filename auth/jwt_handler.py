@@ -1,17 +1,31 @@
 from datetime import datetime, timedelta
+from typing import Optional
+from uuid import uuid4
 from jose import JWTError, jwt
 from config import settings
 
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
+    # jti lets a single access token be revoked (see auth/revocation.py)
+    to_encode.update({"exp": expire, "jti": uuid4().hex, "type": "access"})
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str):
+def create_refresh_token(data: dict, family: Optional[str] = None):
+    # Every token rotated from the same login shares a family, so reuse of a
+    # stolen refresh token can revoke the whole chain
+    to_encode = data.copy()
+    expire = datetime.utcnow() + timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+    to_encode.update({"exp": expire, "jti": uuid4().hex, "fam": family or uuid4().hex, "type": "refresh"})
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
+
+def verify_token(token: str, token_type: str = "access"):
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
-        return payload  # Returns user data from the token if valid
     except JWTError:
         return None  # Invalid token
+    # Tokens issued before refresh tokens existed have no type and are access tokens
+    if payload.get("type", "access") != token_type:
+        return None
+    return payload  # Returns user data from the token if valid
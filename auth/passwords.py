@@ -0,0 +1,57 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+from config import settings
+
+
+class PasswordHasherBusy(Exception):
+    """Raised instead of queueing when too many hashes are already waiting."""
+
+
+class PasswordHasher:
+    """bcrypt hashing on its own bounded thread pool.
+
+    bcrypt releases the GIL, so `workers` threads use up to that many cores
+    without tying up the server's threadpool or event loop. At most
+    `max_pending` operations wait for a worker; beyond that callers get
+    PasswordHasherBusy, so a login burst fails fast instead of queueing
+    without limit.
+    """
+
+    def __init__(
+        self,
+        rounds: int = settings.BCRYPT_ROUNDS,
+        workers: int = settings.PASSWORD_HASH_WORKERS,
+        max_pending: int = settings.PASSWORD_HASH_MAX_PENDING,
+    ):
+        # Hashes with a different cost are verified as usual and flagged by needs_update
+        self.context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=rounds)
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._in_flight = 0
+
+    async def _run(self, fn, *args):
+        if self._in_flight >= self.workers + self.max_pending:
+            raise PasswordHasherBusy()
+        self._in_flight += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+        finally:
+            self._in_flight -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self.context.hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Returns (valid, new_hash); new_hash is set when the stored hash uses another cost."""
+        return await self._run(self.context.verify_and_update, password, hashed_password)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+password_hasher = PasswordHasher()
@@ -0,0 +1,52 @@
+import time
+
+from config import settings
+from redis_pool import redis_pool
+
+
+class TokenRevocationStore:
+    """Revoked token ids and refresh-token families in Redis.
+
+    Every check is a single EXISTS or SET, and every entry expires together
+    with the token it revokes, so the denylist never outgrows the tokens
+    still alive.
+    """
+
+    def __init__(self, client, prefix: str = "auth"):
+        self.client = client
+        self.token_prefix = f"{prefix}:revoked:"
+        self.family_prefix = f"{prefix}:revoked-family:"
+
+    @staticmethod
+    def _ttl(expires_at: int) -> int:
+        return max(1, int(expires_at - time.time()))
+
+    async def revoke(self, jti: str, expires_at: int):
+        await self.client.set(f"{self.token_prefix}{jti}", 1, ex=self._ttl(expires_at))
+
+    async def is_revoked(self, jti: str) -> bool:
+        return bool(await self.client.exists(f"{self.token_prefix}{jti}"))
+
+    async def revoke_family(self, family: str):
+        # Outlives any refresh token that could still be rotated from the family
+        await self.client.set(
+            f"{self.family_prefix}{family}", 1, ex=settings.REFRESH_TOKEN_EXPIRE_DAYS * 24 * 3600
+        )
+
+    async def use_refresh_token(self, payload: dict) -> bool:
+        """Marks a refresh token as used, in one round trip.
+
+        Returns False if it was used before or its family is revoked. A
+        second use means the token leaked, so the family is revoked too.
+        """
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.set(f"{self.token_prefix}{payload['jti']}", 1, ex=self._ttl(payload["exp"]), nx=True)
+            pipe.exists(f"{self.family_prefix}{payload['fam']}")
+            first_use, family_revoked = await pipe.execute()
+        if not first_use:
+            await self.revoke_family(payload["fam"])
+            return False
+        return not family_revoked
+
+
+revocation_store = TokenRevocationStore(redis_pool.client)
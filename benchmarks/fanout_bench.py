@@ -0,0 +1,96 @@
+"""Room broadcast latency with 1k simulated sockets.
+
+Run from the repository root:
+
+    python -m benchmarks.fanout_bench --sockets 1000 --slow 10 --messages 50 --interval 0.01
+
+Compares the old sequential `await send_text` loop with the per-socket
+queue fan-out in `sockets.fanout`, measuring how long the fast members of
+a room wait for each message while a few members are slow.
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from sockets.fanout import BackpressurePolicy, SocketSender
+
+
+class FakeWebSocket:
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.latencies = []
+
+    async def send_text(self, message: str):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        sent_at = float(message.split(":", 1)[0])
+        self.latencies.append(time.perf_counter() - sent_at)
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def make_room(sockets: int, slow: int, slow_delay: float):
+    return [FakeWebSocket(slow_delay if i < slow else 0.0) for i in range(sockets)]
+
+
+def report(name: str, room, slow: int, elapsed: float):
+    fast = [l for ws in room[slow:] for l in ws.latencies]
+    fast.sort()
+    p99 = fast[int(len(fast) * 0.99) - 1] if fast else float("nan")
+    print(
+        f"{name:>22}: total {elapsed * 1000:9.1f} ms | fast members "
+        f"median {statistics.median(fast) * 1000:8.3f} ms p99 {p99 * 1000:8.3f} ms "
+        f"({len(fast)} deliveries)"
+    )
+
+
+async def run_sequential(args):
+    room = make_room(args.sockets, args.slow, args.slow_delay)
+    start = time.perf_counter()
+    for _ in range(args.messages):
+        message = f"{time.perf_counter()}:hello"
+        for ws in room:
+            await ws.send_text(message)
+        await asyncio.sleep(args.interval)
+    report("sequential", room, args.slow, time.perf_counter() - start)
+
+
+async def run_fanout(args, policy: BackpressurePolicy):
+    room = make_room(args.sockets, args.slow, args.slow_delay)
+    senders = [
+        SocketSender(ws, max_queue=args.queue, policy=policy, send_timeout=30, max_coalesced_bytes=1 << 20)
+        for ws in room
+    ]
+    for sender in senders:
+        sender.start()
+    start = time.perf_counter()
+    for _ in range(args.messages):
+        message = f"{time.perf_counter()}:hello"
+        for sender in senders:
+            sender.offer(message)
+        await asyncio.sleep(args.interval)
+    while any(len(ws.latencies) < args.messages for ws in room[args.slow:]):
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+    for sender in senders:
+        await sender.stop()
+    report(f"fanout/{policy.value}", room, args.slow, elapsed)
+
+
+async def main(args):
+    await run_sequential(args)
+    for policy in BackpressurePolicy:
+        await run_fanout(args, policy)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sockets", type=int, default=1000)
+    parser.add_argument("--slow", type=int, default=10, help="members that take --slow-delay per send")
+    parser.add_argument("--slow-delay", type=float, default=0.02)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.01, help="seconds between chat messages")
+    parser.add_argument("--queue", type=int, default=256)
+    asyncio.run(main(parser.parse_args()))
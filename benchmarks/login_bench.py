@@ -0,0 +1,82 @@
+"""Login throughput and latency of password verification.
+
+Run from the repository root:
+
+    python -m benchmarks.login_bench --rounds 12 --workers 1,2,4,8 --concurrency 64 --logins 256
+
+Fires `--logins` concurrent verifications (at most `--concurrency` in
+flight) at `auth.passwords.PasswordHasher` for each pool size and prints
+throughput with p50/p95/p99 latency, plus how many were rejected as busy.
+Pick the smallest pool whose p99 meets the login latency target; more
+workers than cores only adds queueing. Also shows one old-cost login
+being upgraded to `--rounds`.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from auth.passwords import PasswordHasher, PasswordHasherBusy
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(args, workers: int, hashed: str):
+    hasher = PasswordHasher(rounds=args.rounds, workers=workers, max_pending=args.max_pending)
+    gate = asyncio.Semaphore(args.concurrency)
+    latencies, busy = [], 0
+
+    async def login():
+        nonlocal busy
+        async with gate:
+            start = time.perf_counter()
+            try:
+                valid, _ = await hasher.verify("correct horse battery staple", hashed)
+                assert valid
+                latencies.append(time.perf_counter() - start)
+            except PasswordHasherBusy:
+                busy += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(login() for _ in range(args.logins)))
+    elapsed = time.perf_counter() - start
+    hasher.shutdown()
+
+    ms = [latency * 1000 for latency in latencies]
+    print(
+        f"workers={workers:>3}  {len(latencies) / elapsed:8.1f} logins/s"
+        f"  p50={statistics.median(ms):8.1f} ms  p95={percentile(ms, 95):8.1f} ms"
+        f"  p99={percentile(ms, 99):8.1f} ms  busy={busy}"
+    )
+
+
+async def main(args):
+    print(f"bcrypt rounds={args.rounds}, {os.cpu_count()} CPUs, concurrency={args.concurrency}")
+    hasher = PasswordHasher(rounds=args.rounds, workers=1)
+    hashed = await hasher.hash("correct horse battery staple")
+
+    start = time.perf_counter()
+    await hasher.verify("correct horse battery staple", hashed)
+    print(f"single verify: {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    old = await PasswordHasher(rounds=max(4, args.rounds - 2), workers=1).hash("correct horse battery staple")
+    _, upgraded = await hasher.verify("correct horse battery staple", old)
+    print(f"rehash on login: {old[:7]} -> {upgraded[:7] if upgraded else None}")
+    hasher.shutdown()
+
+    for workers in (int(w) for w in args.workers.split(",")):
+        await run(args, workers, hashed)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rounds", type=int, default=12)
+    parser.add_argument("--workers", default="1,2,4,8", help="comma separated pool sizes to try")
+    parser.add_argument("--concurrency", type=int, default=64, help="logins in flight at once")
+    parser.add_argument("--logins", type=int, default=256)
+    parser.add_argument("--max-pending", type=int, default=1024, help="PASSWORD_HASH_MAX_PENDING for the run")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,96 @@
+"""Skill matching at 100k profiles x 10k jobs.
+
+Run from the repository root:
+
+    python -m benchmarks.matching_bench --profiles 100000 --jobs 10000
+
+Builds the in-memory matrices of `matching.engine.MatchingEngine` from
+synthetic data, then times per-job candidate ranking, per-profile job
+recommendations, incremental profile updates and a full all-jobs sweep.
+"""
+import argparse
+import random
+import time
+
+import numpy as np
+
+from matching.engine import MatchingEngine
+
+FILLER = "we are hiring an engineer to join our team and work on exciting products with".split()
+
+
+def synthetic_data(args):
+    rng = random.Random(42)
+    skills = [f"skill{i}" for i in range(args.skills)]
+    # Zipf-like popularity so a few skills are very common, as in real profiles
+    weights = [1 / (i + 1) for i in range(args.skills)]
+    profiles = [
+        (pid, pid, rng.choices(skills, weights, k=rng.randint(5, 20)))
+        for pid in range(1, args.profiles + 1)
+    ]
+    jobs = []
+    for jid in range(args.jobs):
+        words = rng.choices(FILLER, k=80) + rng.choices(skills, weights, k=rng.randint(5, 15))
+        rng.shuffle(words)
+        jobs.append((f"job-{jid}", f"Engineer {jid}", " ".join(words)))
+    return profiles, jobs
+
+
+def timed(label, fn, repeat=1):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f"{label:>36}: {elapsed * 1000:10.2f} ms")
+    return result
+
+
+def main(args):
+    profiles, jobs = synthetic_data(args)
+    engine = MatchingEngine(refresh_seconds=10 ** 9)
+    timed(f"load {args.profiles} profiles/{args.jobs} jobs", lambda: engine.load(profiles, jobs))
+
+    rng = random.Random(7)
+    job_ids = [j[0] for j in rng.sample(jobs, 100)]
+    profile_ids = [p[0] for p in rng.sample(profiles, 100)]
+    it = iter(job_ids * 10)
+    timed("candidates_for_job (avg)", lambda: engine.candidates_for_job(next(it), args.top_k), repeat=100)
+    it = iter(profile_ids * 10)
+    timed("jobs_for_profile (avg)", lambda: engine.jobs_for_profile(next(it), args.top_k), repeat=100)
+
+    updates = iter(range(1, args.profiles + 1))
+    timed(
+        "upsert_profile (avg)",
+        lambda: engine.upsert_profile(next(updates), 0, ["skill1", "skill2", f"newskill{rng.random()}"]),
+        repeat=100,
+    )
+    it = iter(job_ids * 10)
+    timed("candidates_for_job after upserts", lambda: engine.candidates_for_job(next(it), args.top_k), repeat=100)
+
+    def sweep():
+        # Every job against every profile, chunked so the dense score block stays small
+        engine.profiles.compact()
+        engine.jobs.compact()
+        profile_matrix = engine.profiles.base
+        job_matrix = engine.jobs.base
+        n_cols = max(profile_matrix.shape[1], job_matrix.shape[1])
+        profile_matrix.resize((profile_matrix.shape[0], n_cols))
+        job_matrix.resize((job_matrix.shape[0], n_cols))
+        job_sizes = np.maximum(engine.jobs.base_sizes, 1)
+        profile_matrix_t = profile_matrix.T.tocsr()
+        for start in range(0, job_matrix.shape[0], args.chunk):
+            block = (job_matrix[start:start + args.chunk] @ profile_matrix_t).toarray()
+            block /= job_sizes[start:start + args.chunk, None]
+            np.argpartition(-block, args.top_k - 1, axis=1)[:, :args.top_k]
+
+    timed(f"full sweep, top {args.top_k} for all jobs", sweep)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", type=int, default=100_000)
+    parser.add_argument("--jobs", type=int, default=10_000)
+    parser.add_argument("--skills", type=int, default=2_000)
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--chunk", type=int, default=256, help="jobs scored per block in the full sweep")
+    main(parser.parse_args())
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from config import settings
+from redis_pool import RedisSubscription
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Live caches by namespace, so invalidations published by other workers reach them
+_caches: Dict[str, "weakref.WeakSet[Cache]"] = {}
+
+
+class TTLCache:
+    """Thread-safe in-process LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, maxsize: int = settings.CACHE_MAX_ENTRIES, ttl: float = 60):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is _MISSING:
+                return default
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            self._data[key] = (time.monotonic() + (self.ttl if ttl is None else ttl), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class Cache:
+    """In-process TTLCache in front of an optional Redis layer shared by all workers.
+
+    Keys are strings and values must be JSON serializable. Redis failures are
+    logged and degrade to the in-process layer only.
+
+    With Redis enabled, deletes are also published on `INVALIDATION_CHANNEL`,
+    and `cache_invalidations` drops the entry from every worker's local layer.
+    Without it, other workers keep serving their copy for up to `ttl` seconds.
+    """
+
+    INVALIDATION_CHANNEL = "cache:invalidate"
+
+    def __init__(
+        self,
+        namespace: str,
+        ttl: float,
+        maxsize: int = settings.CACHE_MAX_ENTRIES,
+        use_redis: bool = settings.CACHE_REDIS_ENABLED,
+    ):
+        self.namespace = namespace
+        self.ttl = ttl
+        self.local = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.use_redis = use_redis
+        self._redis = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        _caches.setdefault(namespace, weakref.WeakSet()).add(self)
+
+    def _redis_client(self):
+        if self._redis is None:
+            from redis_pool import redis_pool
+
+            self._redis = redis_pool.client
+            self._loop = asyncio.get_running_loop()
+        return self._redis
+
+    def _key(self, key: str) -> str:
+        return f"cache:{self.namespace}:{key}"
+
+    async def get(self, key: str, default: Any = None) -> Any:
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            return value
+        if self.use_redis:
+            try:
+                raw = await self._redis_client().get(self._key(key))
+            except Exception as e:
+                logger.warning("Cache %s: Redis get failed: %r", self.namespace, e)
+                raw = None
+            if raw is not None:
+                value = json.loads(raw)
+                self.local.set(key, value)
+                return value
+        return default
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        self.local.set(key, value, ttl)
+        if self.use_redis:
+            try:
+                await self._redis_client().set(self._key(key), json.dumps(value), ex=max(1, int(ttl)))
+            except Exception as e:
+                logger.warning("Cache %s: Redis set failed: %r", self.namespace, e)
+
+    async def delete(self, key: str):
+        self.local.delete(key)
+        if self.use_redis:
+            try:
+                client = self._redis_client()
+                await client.delete(self._key(key))
+                await client.publish(self.INVALIDATION_CHANNEL, json.dumps([self.namespace, key]))
+            except Exception as e:
+                logger.warning("Cache %s: Redis delete failed: %r", self.namespace, e)
+
+    def invalidate(self, key: str):
+        """Synchronous delete for code outside the event loop, e.g. SQLAlchemy events.
+
+        The local entry goes at once; the Redis delete is scheduled on the
+        loop that owns the Redis client.
+        """
+        self.local.delete(key)
+        if not self.use_redis:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is not None:
+            running.create_task(self.delete(key))
+        elif self._loop is not None and not self._loop.is_closed():
+            # Called from a worker thread, e.g. a sync route's session commit
+            asyncio.run_coroutine_threadsafe(self.delete(key), self._loop)
+
+
+class CacheInvalidations:
+    """Drops local entries that another worker deleted, via Redis pub/sub.
+
+    A worker that misses messages while its subscription is down may serve
+    stale entries until they expire, as without Redis.
+    """
+
+    def __init__(self, client):
+        self._subscription = RedisSubscription(client, lambda channel, data: self.apply(data), "Cache invalidations")
+
+    async def start(self):
+        await self._subscription.subscribe(Cache.INVALIDATION_CHANNEL)
+        await self._subscription.start()
+
+    async def stop(self):
+        await self._subscription.stop()
+
+    def apply(self, data: str):
+        try:
+            namespace, key = json.loads(data)
+        except (ValueError, TypeError):
+            logger.warning("Ignoring malformed cache invalidation %r", data)
+            return
+        for cache in list(_caches.get(namespace, ())):
+            cache.local.delete(key)
+
+
+def create_cache_invalidations() -> CacheInvalidations:
+    from redis_pool import redis_pool
+
+    return CacheInvalidations(redis_pool.client)
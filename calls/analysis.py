@@ -0,0 +1,272 @@
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from typing import AsyncIterator, Optional, Tuple
+
+import groq
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from cache import Cache
+from config import settings
+from models import InterviewReport, Room
+from .storage import get_object, iter_body, list_objects
+
+logger = logging.getLogger(__name__)
+
+PROMPT = """
+       Analyze the following conversation log and generate a detailed feedback report.
+        Answer Feedback: Analyze the user's response in detail, focusing on multiple factors but you should include only three major points which is much needed
+
+        Overall Feedback: Summarize the quality of the response as one of the following: excellent, good, needs improvement, bad, or worst.
+        Response Format:
+        '"Keypoint which user lags": "<Feedback>"
+        "keypoint which user lags": "<Feedback>",
+        "Avoid Redundancy": "<Feedback>" },
+        "overall_feedback": "<Overall assessment>"}
+        """
+
+# Transient failures worth another attempt; anything else fails the analysis right away
+RETRYABLE_ERRORS = (
+    groq.RateLimitError,
+    groq.APIConnectionError,
+    groq.APITimeoutError,
+    groq.InternalServerError,
+)
+
+class TranscriptNotFound(Exception):
+    pass
+
+
+async def stream_lines(bucket: str, key: str, chunk_size: int = 64 * 1024) -> AsyncIterator[str]:
+    # Reads the object chunk by chunk instead of downloading it whole
+    response = await get_object(bucket, key)
+    pending = b""
+    async for chunk in iter_body(response["Body"], chunk_size):
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if pending:
+        yield pending.decode("utf-8")
+
+
+async def stream_qa_pairs(lines: AsyncIterator[str]) -> AsyncIterator[Tuple[str, str]]:
+    """Yields (question, answer) for every AGENT line followed by a USER line."""
+    current_question = None
+    async for line in lines:
+        if "AGENT:" in line:
+            # Extract the question part
+            current_question = line.split("AGENT:")[-1].strip()
+        elif "USER:" in line and current_question:
+            yield current_question, line.split("USER:")[-1].strip()
+            # Reset current_question for the next pair
+            current_question = None
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` acquisitions per second, with bursts up to `burst`."""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self.tokens = float(self.capacity)
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class FeedbackAnalyzer:
+    """Gets LLM feedback for question/answer pairs.
+
+    Calls run concurrently under ANALYSIS_CONCURRENCY and
+    ANALYSIS_RATE_PER_SECOND, transient errors are retried with exponential
+    backoff, and feedback is cached by a hash of model, prompt and pair.
+    """
+
+    def __init__(
+        self,
+        model: str = settings.GROQ_MODEL,
+        concurrency: int = settings.ANALYSIS_CONCURRENCY,
+        rate_per_second: float = settings.ANALYSIS_RATE_PER_SECOND,
+        max_retries: int = settings.ANALYSIS_MAX_RETRIES,
+        client=None,
+    ):
+        self.model = model
+        self.concurrency = concurrency
+        self.rate_per_second = rate_per_second
+        self.max_retries = max_retries
+        self.cache = Cache("analysis-feedback", ttl=settings.ANALYSIS_FEEDBACK_CACHE_TTL)
+        self._client = client
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._limiter: Optional[RateLimiter] = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            # Retries are handled here, so the SDK's own are disabled
+            self._client = groq.AsyncGroq(base_url=settings.GROQ_BASE_URL, max_retries=0)
+        return self._client
+
+    def _limits(self):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            self._limiter = RateLimiter(self.rate_per_second)
+        return self._semaphore, self._limiter
+
+    def cache_key(self, question: str, answer: str) -> str:
+        digest = hashlib.sha256()
+        for part in (self.model, PROMPT, question, answer):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    async def feedback(self, question: str, answer: str) -> str:
+        key = self.cache_key(question, answer)
+        cached = await self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        semaphore, limiter = self._limits()
+        async with semaphore:
+            for attempt in range(self.max_retries + 1):
+                await limiter.acquire()
+                try:
+                    chat_completion = await self.client.chat.completions.create(
+                        messages=[{"role": "user", "content": PROMPT + f" question : {question}, User_answer: {answer}"}],
+                        model=self.model,
+                    )
+                    break
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries:
+                        raise
+                    delay = min(30, 0.5 * 2 ** attempt) * (0.5 + random.random())
+                    logger.info("LLM call failed (%r), retrying in %.1fs", e, delay)
+                    await asyncio.sleep(delay)
+
+        # Extract analysis
+        feedback_report = chat_completion.choices[0].message.content
+        await self.cache.set(key, feedback_report)
+        return feedback_report
+
+    async def stream(self, pairs: AsyncIterator[Tuple[str, str]]) -> AsyncIterator[Tuple[int, dict]]:
+        """Yields (position, record) as each LLM call finishes, while `pairs` is still being read."""
+        results: asyncio.Queue = asyncio.Queue()
+        tasks = set()
+
+        async def run(position: int, question: str, answer: str):
+            try:
+                feedback_report = await self.feedback(question, answer)
+                await results.put((position, {"question": question, "answer": answer, "feedback": feedback_report}))
+            except Exception as e:
+                await results.put((position, e))
+
+        count = received = 0
+        try:
+            async for question, answer in pairs:
+                tasks.add(asyncio.create_task(run(count, question, answer)))
+                count += 1
+                while not results.empty():
+                    received += 1
+                    yield self._unwrap(results.get_nowait())
+            while received < count:
+                received += 1
+                yield self._unwrap(await results.get())
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    @staticmethod
+    def _unwrap(item):
+        position, record = item
+        if isinstance(record, Exception):
+            raise record
+        return position, record
+
+
+analyzer = FeedbackAnalyzer()
+
+
+def room_summary(room: Room) -> dict:
+    return {"id": room.id, "name": room.name, "is_group": room.is_group}
+
+
+async def find_transcript(bucket: str, room_id: str) -> dict:
+    objects = await list_objects(bucket, f"{room_id}/")
+    if not objects:
+        raise TranscriptNotFound("No files found in the room's S3 folder")
+    # Filter for .log files
+    log_file = next((obj for obj in objects if obj["Key"].endswith(".log")), None)
+    if not log_file:
+        raise TranscriptNotFound("No .log file found in the room's S3 folder")
+    return log_file
+
+
+async def get_saved_report(db: AsyncSession, room_id: str, log_file: dict) -> Optional[dict]:
+    saved = await db.get(InterviewReport, room_id)
+    if saved and saved.log_key == log_file["Key"] and saved.log_etag == log_file.get("ETag"):
+        return saved.report
+    return None
+
+
+async def save_report(db: AsyncSession, room_id: str, log_file: dict, report: dict):
+    values = {"room_id": room_id, "log_key": log_file["Key"], "log_etag": log_file.get("ETag"), "report": report}
+    stmt = insert(InterviewReport).values(**values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[InterviewReport.room_id],
+        set_={**values, "created_at": func.now()},
+    )
+    await db.execute(stmt)
+    await db.commit()
+
+
+async def stream_room_analysis(
+    db: AsyncSession, room: Room, bucket: str, log_file: dict, refresh: bool = False
+) -> AsyncIterator[dict]:
+    """Yields each feedback record, tagged with its `position` in the transcript,
+    as soon as its LLM call finishes; the full report is saved once all are in.
+
+    A saved report for an unchanged transcript is replayed instead.
+    """
+    if not refresh:
+        saved = await get_saved_report(db, room.id, log_file)
+        if saved is not None:
+            for position, record in enumerate(saved["feedback_report"]):
+                yield {"position": position, **record}
+            return
+
+    records = {}
+    async for position, record in analyzer.stream(stream_qa_pairs(stream_lines(bucket, log_file["Key"]))):
+        records[position] = record
+        yield {"position": position, **record}
+
+    report = {
+        "room": room_summary(room),
+        "feedback_report": [records[i] for i in sorted(records)],
+    }
+    await save_report(db, room.id, log_file, report)
+
+
+async def analyze_room(db: AsyncSession, room: Room, bucket: str, refresh: bool = False) -> dict:
+    """Full feedback report for a room's transcript, reusing the saved one if the log is unchanged."""
+    log_file = await find_transcript(bucket, room.id)
+    records = {}
+    async for record in stream_room_analysis(db, room, bucket, log_file, refresh):
+        records[record.pop("position")] = record
+    return {
+        "room": room_summary(room),
+        "feedback_report": [records[i] for i in sorted(records)],
+    }
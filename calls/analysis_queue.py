@@ -0,0 +1,320 @@
+import asyncio
+import logging
+import os
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+from uuid import uuid4
+
+from config import settings
+from database import AsyncSessionLocal
+from models import Room
+from .analysis import TranscriptNotFound, analyze_room
+from .storage import invalidate_listing
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class AnalysisQueue(ABC):
+    """Log analysis jobs, deduplicated per room: while a room has a queued or
+    running job, enqueueing it again returns that job instead of a new one,
+    unless `refresh` asks for a fresh run."""
+
+    @abstractmethod
+    async def enqueue(self, room_id: str, refresh: bool = False) -> str:
+        ...
+
+    @abstractmethod
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        ...
+
+    @abstractmethod
+    async def next_job(self, timeout: float) -> Optional[str]:
+        ...
+
+    @abstractmethod
+    async def set_status(self, job_id: str, status: str, error: Optional[str] = None):
+        ...
+
+    async def heartbeat(self, job_id: str):
+        """Tells the queue a running job's worker is still alive."""
+
+    async def requeue_expired(self) -> int:
+        """Puts jobs whose worker stopped renewing them back on the queue."""
+        return 0
+
+    async def close(self):
+        pass
+
+
+class RedisAnalysisQueue(AnalysisQueue):
+    """Redis list of job ids plus one hash per job; shared by the API and `worker.py`.
+
+    A dequeued job moves atomically to a processing list and holds a lease
+    that its worker renews while it runs. Jobs whose lease lapses, because
+    the worker crashed or was redeployed, go back on the queue; after
+    `max_attempts` they fail instead, so the room can be enqueued again.
+    """
+
+    ENQUEUE_SCRIPT = """
+    local existing = redis.call('GET', KEYS[1])
+    if ARGV[5] == '0' and existing and redis.call('EXISTS', KEYS[2] .. existing) == 1 then
+        return existing
+    end
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[4])
+    redis.call('HSET', KEYS[2] .. ARGV[1], 'job_id', ARGV[1], 'room_id', ARGV[2], 'status', 'queued',
+        'created_at', ARGV[3], 'refresh', ARGV[5], 'attempts', 0)
+    redis.call('EXPIRE', KEYS[2] .. ARGV[1], ARGV[4])
+    redis.call('LPUSH', KEYS[3], ARGV[1])
+    return ARGV[1]
+    """
+
+    # KEYS: processing list, lease zset, queue, job hash prefix, room key prefix
+    # ARGV: now, lease seconds, max attempts, job ttl
+    REQUEUE_SCRIPT = """
+    local now = tonumber(ARGV[1])
+    local requeued = 0
+    for _, job_id in ipairs(redis.call('LRANGE', KEYS[1], 0, -1)) do
+        local lease = redis.call('ZSCORE', KEYS[2], job_id)
+        if not lease then
+            -- Dequeued but not leased yet: the worker may be just about to; give it one lease period
+            redis.call('ZADD', KEYS[2], now + tonumber(ARGV[2]), job_id)
+        elseif tonumber(lease) < now then
+            redis.call('LREM', KEYS[1], 0, job_id)
+            redis.call('ZREM', KEYS[2], job_id)
+            local job = KEYS[4] .. job_id
+            if redis.call('EXISTS', job) == 1 then
+                local attempts = redis.call('HINCRBY', job, 'attempts', 1)
+                if attempts >= tonumber(ARGV[3]) then
+                    redis.call('HSET', job, 'status', 'failed', 'error', 'Worker lost the job too many times', 'updated_at', now)
+                    redis.call('EXPIRE', job, ARGV[4])
+                    local room_key = KEYS[5] .. redis.call('HGET', job, 'room_id')
+                    if redis.call('GET', room_key) == job_id then
+                        redis.call('DEL', room_key)
+                    end
+                else
+                    redis.call('HSET', job, 'status', 'queued', 'updated_at', now)
+                    redis.call('RPUSH', KEYS[3], job_id)
+                    requeued = requeued + 1
+                end
+            end
+        end
+    end
+    return requeued
+    """
+
+    def __init__(
+        self,
+        client,
+        prefix: str = "analysis",
+        lease_seconds: int = settings.ANALYSIS_JOB_LEASE_SECONDS,
+        max_attempts: int = settings.ANALYSIS_JOB_MAX_ATTEMPTS,
+    ):
+        self.client = client
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.queue_key = f"{prefix}:queue"
+        self.processing_key = f"{prefix}:processing"
+        self.lease_key = f"{prefix}:leases"
+        self.job_prefix = f"{prefix}:job:"
+        self.room_prefix = f"{prefix}:room:"
+        self._enqueue = client.register_script(self.ENQUEUE_SCRIPT)
+        self._requeue = client.register_script(self.REQUEUE_SCRIPT)
+
+    async def enqueue(self, room_id: str, refresh: bool = False) -> str:
+        # Atomic dedupe-and-push, so concurrent uploads of one room create a single job
+        job_id = await self._enqueue(
+            keys=[f"{self.room_prefix}{room_id}", self.job_prefix, self.queue_key],
+            args=[uuid4().hex, room_id, int(time.time()), settings.ANALYSIS_JOB_TTL, int(refresh)],
+        )
+        return job_id.decode() if isinstance(job_id, bytes) else job_id
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        job = await self.client.hgetall(f"{self.job_prefix}{job_id}")
+        if not job:
+            return None
+        return {
+            (k.decode() if isinstance(k, bytes) else k): (v.decode() if isinstance(v, bytes) else v)
+            for k, v in job.items()
+        }
+
+    async def next_job(self, timeout: float) -> Optional[str]:
+        job_id = await self.client.blmove(self.queue_key, self.processing_key, timeout, "RIGHT", "LEFT")
+        if job_id is None:
+            return None
+        job_id = job_id.decode() if isinstance(job_id, bytes) else job_id
+        await self.heartbeat(job_id)
+        return job_id
+
+    async def heartbeat(self, job_id: str):
+        await self.client.zadd(self.lease_key, {job_id: time.time() + self.lease_seconds})
+
+    async def requeue_expired(self) -> int:
+        return await self._requeue(
+            keys=[self.processing_key, self.lease_key, self.queue_key, self.job_prefix, self.room_prefix],
+            args=[time.time(), self.lease_seconds, self.max_attempts, settings.ANALYSIS_JOB_TTL],
+        )
+
+    async def set_status(self, job_id: str, status: str, error: Optional[str] = None):
+        key = f"{self.job_prefix}{job_id}"
+        fields = {"status": status, "updated_at": int(time.time())}
+        if error is not None:
+            fields["error"] = error
+        async with self.client.pipeline(transaction=True) as pipe:
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, settings.ANALYSIS_JOB_TTL)
+            if status in (DONE, FAILED):
+                # Acknowledge: the job leaves the processing list for good
+                pipe.lrem(self.processing_key, 0, job_id)
+                pipe.zrem(self.lease_key, job_id)
+            await pipe.execute()
+        if status in (DONE, FAILED):
+            job = await self.get_job(job_id)
+            if job:
+                # Lets the next upload of this room start a new job
+                room_key = f"{self.room_prefix}{job['room_id']}"
+                current = await self.client.get(room_key)
+                if current in (job_id, job_id.encode()):
+                    await self.client.delete(room_key)
+
+
+class InMemoryAnalysisQueue(AnalysisQueue):
+    """Single-process stand-in: jobs run inside the API process, no Redis needed.
+
+    Finished jobs are forgotten `ttl` seconds after they finish, like the
+    Redis job hashes.
+    """
+
+    def __init__(self, ttl: float = settings.ANALYSIS_JOB_TTL):
+        self.ttl = ttl
+        self.jobs: Dict[str, dict] = {}
+        self.rooms: Dict[str, str] = {}
+        self._finished: Deque[Tuple[float, str]] = deque()
+        self._queue: Optional[asyncio.Queue] = None
+
+    @property
+    def queue(self) -> asyncio.Queue:
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    def _prune(self):
+        now = time.monotonic()
+        while self._finished and self._finished[0][0] <= now:
+            _, job_id = self._finished.popleft()
+            job = self.jobs.pop(job_id, None)
+            if job and self.rooms.get(job["room_id"]) == job_id:
+                del self.rooms[job["room_id"]]
+
+    async def enqueue(self, room_id: str, refresh: bool = False) -> str:
+        self._prune()
+        existing = self.rooms.get(room_id)
+        if not refresh and existing and self.jobs[existing]["status"] in (QUEUED, RUNNING):
+            return existing
+        job_id = uuid4().hex
+        self.jobs[job_id] = {
+            "job_id": job_id,
+            "room_id": room_id,
+            "status": QUEUED,
+            "created_at": int(time.time()),
+            "refresh": int(refresh),
+        }
+        self.rooms[room_id] = job_id
+        await self.queue.put(job_id)
+        return job_id
+
+    async def get_job(self, job_id: str) -> Optional[dict]:
+        self._prune()
+        job = self.jobs.get(job_id)
+        return dict(job) if job else None
+
+    async def next_job(self, timeout: float) -> Optional[str]:
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    async def set_status(self, job_id: str, status: str, error: Optional[str] = None):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return
+        job.update(status=status, updated_at=int(time.time()))
+        if error is not None:
+            job["error"] = error
+        if status in (DONE, FAILED):
+            self._finished.append((time.monotonic() + self.ttl, job_id))
+
+
+def create_queue() -> AnalysisQueue:
+    if settings.ANALYSIS_QUEUE_BACKEND == "redis":
+        from redis_pool import redis_pool
+
+        return RedisAnalysisQueue(redis_pool.client)
+    return InMemoryAnalysisQueue()
+
+
+analysis_queue = create_queue()
+
+
+async def keep_leased(queue: AnalysisQueue, job_id: str, interval: float):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await queue.heartbeat(job_id)
+        except Exception as e:
+            logger.warning("Could not renew the lease of analysis job %s: %r", job_id, e)
+
+
+async def process_job(queue: AnalysisQueue, job_id: str):
+    job = await queue.get_job(job_id)
+    if job is None:
+        return  # Expired before a worker got to it
+    await queue.set_status(job_id, RUNNING)
+    lease = asyncio.create_task(keep_leased(queue, job_id, settings.ANALYSIS_JOB_LEASE_SECONDS / 3))
+    try:
+        async with AsyncSessionLocal() as db:
+            room = await db.get(Room, job["room_id"])
+            if room is None:
+                raise TranscriptNotFound(f"Room {job['room_id']} not found")
+            # The transcript may have just been replaced; list it fresh so its ETag is current
+            bucket_name = os.environ.get("BUCKET_NAME")
+            await invalidate_listing(bucket_name, f"{room.id}/")
+            await analyze_room(db, room, bucket_name, refresh=str(job.get("refresh", "0")) == "1")
+        await queue.set_status(job_id, DONE)
+    except Exception as e:
+        logger.exception("Analysis job %s for room %s failed", job_id, job["room_id"])
+        await queue.set_status(job_id, FAILED, error=str(e))
+    finally:
+        lease.cancel()
+
+
+async def run_worker(queue: AnalysisQueue, concurrency: int = settings.ANALYSIS_WORKER_CONCURRENCY):
+    """Pulls jobs until cancelled, running up to `concurrency` rooms at a time."""
+    slots = asyncio.Semaphore(concurrency)
+    running = set()
+    try:
+        while True:
+            await slots.acquire()
+            try:
+                # Jobs of crashed workers; every worker checks, the script makes it safe
+                requeued = await queue.requeue_expired()
+                if requeued:
+                    logger.warning("Requeued %d analysis jobs whose worker went away", requeued)
+            except Exception as e:
+                logger.warning("Could not requeue expired analysis jobs: %r", e)
+            job_id = await queue.next_job(timeout=5)
+            if job_id is None:
+                slots.release()
+                continue
+            task = asyncio.create_task(process_job(queue, job_id))
+            running.add(task)
+            task.add_done_callback(lambda t: (running.discard(t), slots.release()))
+    finally:
+        # Give rooms already being analyzed a chance to finish before exiting
+        if running:
+            _, pending = await asyncio.wait(running, timeout=30)
+            for task in pending:
+                task.cancel()
@@ -1,15 +1,37 @@
+import hmac
 import json
-import aiohttp
-from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi.responses import JSONResponse
+import mimetypes
+import re
+from email.utils import format_datetime
+from typing import List, Literal, Optional
+from urllib.parse import quote, unquote_plus
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, status
+from botocore.exceptions import ClientError
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from auth.dependencies import get_current_user
-from database import get_db
-from models import User, Room, UserRoom
-from schemas import InterviewRequest, RoomInfoResponse, RoomTokenRequest   
+from database import AsyncSessionLocal, get_async_db, get_db
+from models import InterviewReport, User, Room, UserRoom
+from schemas import (
+    CurrentUser,
+    InterviewBatchRequest,
+    InterviewBatchResponse,
+    InterviewRecord,
+    InterviewRequest,
+    PresignedUrl,
+    PresignRequest,
+    RoomBulkCreateResponse,
+    RoomBulkDeleteResponse,
+    RoomBulkFailure,
+    RoomBulkRequest,
+    RoomInfoResponse,
+    RoomTokenRequest,
+)
 from auth.jwt_handler import verify_token
-from livekit import api
 from config import settings
+from redis_pool import redis_pool
 
 from livekit.protocol.agent_dispatch import (
     RoomAgentDispatch,
@@ -20,49 +42,64 @@ from livekit.api import AccessToken, VideoGrants
 
 from livekit.protocol.room import RoomConfiguration
 
-from livekit import api
 import asyncio
-import boto3
+from .analysis import TranscriptNotFound, find_transcript, get_saved_report, stream_room_analysis
+from .analysis_queue import DONE, analysis_queue
+from .interview_store import InterviewStore
+from .livekit_pool import livekit_client
+from .storage import get_object, head_object, invalidate_listing, iter_body, list_objects, presign_many
 
+import logging
 import os
-from groq import Groq
-import redis
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-s3_client = boto3.client(
-            "s3",
-            endpoint_url=os.environ.get("STORAGE_ENDPOINT"),
-            aws_access_key_id=os.environ.get("STORAGE_ACCESS_KEY"),
-            aws_secret_access_key=os.environ.get("STORAGE_SECRET_KEY"),
-            region_name=os.environ.get("STORAGE_REGION")
-        )
-        
+def get_redis_client():
+    # Health comes from redis_pool's background probe, so requests skip the extra PING
+    if not redis_pool.healthy:
+        raise HTTPException(status_code=500, detail="Cannot connect to Redis")
+    return redis_pool.client
 
-groq_client = Groq(api_key=os.environ.get("GROQ_API_KEY"))
 
+interview_store = InterviewStore(redis_pool.client)
 
-# Redis connection
-redis_client = redis.StrictRedis(host='localhost', port=6379, db=0, decode_responses=True)
 
-def get_redis_client():
-    try:
-        redis_client.ping()
-        return redis_client
-    except redis.ConnectionError:
-        raise HTTPException(status_code=500, detail="Cannot connect to Redis")
+def get_interview_store(redis_client=Depends(get_redis_client)) -> InterviewStore:
+    return interview_store
+
+
+async def get_room_with_members(db: AsyncSession, room_id: str):
+    return (
+        await db.scalars(
+            select(Room)
+            .join(UserRoom, Room.id == UserRoom.room_id)
+            .where(UserRoom.room_id == room_id)
+            .limit(1)
+        )
+    ).first()
 
 
+async def member_room_ids(db: AsyncSession, user_id: int, room_ids) -> set:
+    # Which of `room_ids` the user belongs to, in one query
+    return set(
+        await db.scalars(
+            select(UserRoom.room_id).where(UserRoom.user_id == user_id, UserRoom.room_id.in_(set(room_ids)))
+        )
+    )
+
 
 @router.get("/")
-async def list_rooms_with_files(user_id: int, db: Session = Depends(get_db)):
+async def list_rooms_with_files(user_id: int, db: AsyncSession = Depends(get_async_db)):
     # Query rooms for the user
     rooms = (
-        db.query(Room)
-        .join(UserRoom, Room.id == UserRoom.room_id)
-        .filter(UserRoom.user_id == user_id)
-        .all()
-    )
+        await db.scalars(
+            select(Room)
+            .join(UserRoom, Room.id == UserRoom.room_id)
+            .where(UserRoom.user_id == user_id)
+        )
+    ).all()
     
     if not rooms:
         raise HTTPException(status_code=404, detail="No rooms found for the user")
@@ -70,32 +107,32 @@ async def list_rooms_with_files(user_id: int, db: Session = Depends(get_db)):
     # S3 bucket configuration
     bucket_name = "livekit-egress"
 
+    # Folder for each room in S3, listed concurrently
+    listings = await asyncio.gather(
+        *(list_objects(bucket_name, f"{room.id}/") for room in rooms),
+        return_exceptions=True,
+    )
+
     room_files = []
-    for room in rooms:
-        folder_prefix = f"{room.id}/"  # Folder for each room in S3
-        try:
-            response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=folder_prefix)
-            files = []
-            if 'Contents' in response:
-                files = [
-                    {
-                        "file_name": obj["Key"].split("/")[-1],
-                        "size": obj["Size"],
-                        "last_modified": obj["LastModified"].isoformat(),
-                        
-                    }
-                    for obj in response["Contents"]
-                ]
-            room_files.append({
-                "room": {
-                    "id": room.id,
-                    "name": room.name,
-                    "is_group": room.is_group,
-                },
-                "files": files,
-            })
-        except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Error fetching files for room {room.id}: {str(e)}")
+    for room, objects in zip(rooms, listings):
+        if isinstance(objects, Exception):
+            raise HTTPException(status_code=500, detail=f"Error fetching files for room {room.id}: {str(objects)}")
+        files = [
+            {
+                "file_name": obj["Key"].split("/")[-1],
+                "size": obj["Size"],
+                "last_modified": obj["LastModified"],
+            }
+            for obj in objects
+        ]
+        room_files.append({
+            "room": {
+                "id": room.id,
+                "name": room.name,
+                "is_group": room.is_group,
+            },
+            "files": files,
+        })
     
     return room_files
 
@@ -127,14 +164,9 @@ async def list_rooms_with_files(user_id: int, db: Session = Depends(get_db)):
     
 
 @router.get("/{room_id}")
-async def list_room_with_files(room_id: str, db: Session = Depends(get_db)):
+async def list_room_with_files(room_id: str, db: AsyncSession = Depends(get_async_db)):
     # Query rooms for the user
-    room = (
-        db.query(Room)
-        .join(UserRoom, Room.id == UserRoom.room_id)
-        .filter(UserRoom.room_id == room_id)
-        .first()
-    )
+    room = await get_room_with_members(db, room_id)
     
     if not room:
         raise HTTPException(status_code=404, detail="No room found for the user")
@@ -145,22 +177,18 @@ async def list_room_with_files(room_id: str, db: Session = Depends(get_db)):
     
     folder_prefix = f"{room.id}/"  # Folder for each room in S3
     try:
-        response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=folder_prefix)
-        files = []
-        if 'Contents' in response:
-            files = [
-                {
-                    "file_name": obj["Key"].split("/")[-1],
-                    "size": obj["Size"],
-                    "last_modified": obj["LastModified"].isoformat(),
-                    "signed_url": s3_client.generate_presigned_url(
-                "get_object",
-                Params={"Bucket": bucket_name, "Key": obj["Key"]},
-                ExpiresIn=3600,  # URL expiration time in seconds
-            )
-                }
-                for obj in response["Contents"]
-            ]
+        objects = await list_objects(bucket_name, folder_prefix)
+        # Reuses cached URLs while they have enough validity left
+        signed = await presign_many(bucket_name, (obj["Key"] for obj in objects))
+        files = [
+            {
+                "file_name": obj["Key"].split("/")[-1],
+                "size": obj["Size"],
+                "last_modified": obj["LastModified"],
+                "signed_url": signed[obj["Key"]][0],
+            }
+            for obj in objects
+        ]
         return({
             "room": {
                 "id": room.id,
@@ -175,161 +203,323 @@ async def list_room_with_files(room_id: str, db: Session = Depends(get_db)):
    
 
 
+SINGLE_RANGE_RE = re.compile(r"^bytes=(\d+-\d*|-\d+)$")
+
+
+def content_disposition(name: str) -> str:
+    # Quoted ASCII fallback for old clients, and the exact name as RFC 5987 filename*
+    fallback = "".join(c if " " <= c < "\x7f" and c not in '"\\' else "_" for c in name)
+    return f"inline; filename=\"{fallback}\"; filename*=UTF-8''{quote(name, safe='')}"
+
+
+async def unsatisfied_range_headers(bucket: str, key: str, error: dict) -> dict:
+    # 416 responses carry the current length, as "bytes */<size>"
+    size = error.get("ActualObjectSize")
+    if size is None:
+        try:
+            size = (await head_object(bucket, key))["ContentLength"]
+        except ClientError:
+            return {}
+    return {"Content-Range": f"bytes */{size}"}
+
+
+@router.get("/{room_id}/files/{name}")
+async def download_room_file(
+    room_id: str,
+    name: str,
+    range_header: Optional[str] = Header(None, alias="Range"),
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Streams a recording through the API for deployments where the storage isn't public
+    is_member = room_id in await member_room_ids(db, current_user.id, [room_id])
+    # Frees the pooled connection instead of holding it for the whole download
+    await db.close()
+    # Non-members get the same answer as for a missing room
+    if not is_member:
+        raise HTTPException(status_code=404, detail="No room found for the user")
+
+    bucket_name = "livekit-egress"
+    # Multi-range requests are answered with the whole object, which HTTP allows
+    byte_range = range_header.strip() if range_header and SINGLE_RANGE_RE.match(range_header.strip()) else None
+    try:
+        obj = await get_object(bucket_name, f"{room_id}/{name}", byte_range)
+    except ClientError as e:
+        error = e.response.get("Error", {})
+        code = error.get("Code")
+        if code in ("NoSuchKey", "404"):
+            raise HTTPException(status_code=404, detail="File not found")
+        if code == "InvalidRange":
+            raise HTTPException(
+                status_code=416,
+                detail="Invalid range",
+                headers=await unsatisfied_range_headers(bucket_name, f"{room_id}/{name}", error),
+            )
+        raise HTTPException(status_code=500, detail=f"Error fetching file: {str(e)}")
+
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(obj["ContentLength"]),
+        "Content-Disposition": content_disposition(name),
+    }
+    if obj.get("ETag"):
+        headers["ETag"] = obj["ETag"]
+    if obj.get("LastModified"):
+        headers["Last-Modified"] = format_datetime(obj["LastModified"], usegmt=True)
+    if obj.get("ContentRange"):
+        headers["Content-Range"] = obj["ContentRange"]
+
+    return StreamingResponse(
+        iter_body(obj["Body"]),
+        status_code=status.HTTP_206_PARTIAL_CONTENT if obj.get("ContentRange") else status.HTTP_200_OK,
+        media_type=obj.get("ContentType") or mimetypes.guess_type(name)[0] or "application/octet-stream",
+        headers=headers,
+    )
+
+
+def room_of_key(key: str) -> Optional[str]:
+    # Recording keys are "<room_id>/<name>"; anything else is not signable
+    room_id, _, name = key.partition("/")
+    if not room_id or not name or "\\" in key or ".." in key.split("/"):
+        return None
+    return room_id
+
+
+@router.post("/presign", response_model=List[PresignedUrl])
+async def presign_files(
+    request: PresignRequest,
+    current_user: CurrentUser = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Signs many recording keys in one call, e.g. for the recordings page
+    if len(request.keys) > settings.PRESIGN_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.PRESIGN_BATCH_MAX} keys per request",
+        )
+    room_ids = {key: room_of_key(key) for key in request.keys}
+    invalid = [key for key, room_id in room_ids.items() if room_id is None]
+    if invalid:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"Invalid key: {invalid[0]}")
+
+    # Only recordings of rooms the caller is a member of
+    member_of = await member_room_ids(db, current_user.id, room_ids.values())
+    await db.close()
+    forbidden = sorted(set(room_ids.values()) - member_of)
+    if forbidden:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=f"Not a member of room {forbidden[0]}")
+
+    bucket_name = "livekit-egress"
+    signed = await presign_many(bucket_name, request.keys, request.expires_in)
+    return [
+        PresignedUrl(key=key, url=url, expires_at=expires_at)
+        for key, (url, expires_at) in signed.items()
+    ]
+
+
+@router.delete("/{room_id}/files/cache")
+async def invalidate_room_files(room_id: str):
+    # Drops the cached listing, e.g. after a new recording or transcript was uploaded
+    await invalidate_listing("livekit-egress", f"{room_id}/")
+    bucket_name = os.environ.get("BUCKET_NAME")
+    if bucket_name and bucket_name != "livekit-egress":
+        await invalidate_listing(bucket_name, f"{room_id}/")
+    return {"message": "File listing cache cleared"}
+
+
+def analysis_accepted(job_id: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content={"job_id": job_id, "status": "queued", "status_url": f"/calls/analysis-jobs/{job_id}"},
+    )
+
+
 @router.get("/{room_id}/analyze-log")
-async def analyze_room_log(room_id: str, db: Session = Depends(get_db)):
+async def analyze_room_log(room_id: str, refresh: bool = False, db: AsyncSession = Depends(get_async_db)):
+    # ?refresh=true skips the saved report and any queued job, forcing a new run
     # Query room details
-    room = (
-        db.query(Room)
-        .join(UserRoom, Room.id == UserRoom.room_id)
-        .filter(UserRoom.room_id == room_id)
-        .first()
-    )
+    room = await get_room_with_members(db, room_id)
 
     if not room:
         raise HTTPException(status_code=404, detail="No room found for the user")
 
     # S3 bucket configuration
     bucket_name = os.environ.get("BUCKET_NAME")
-    folder_prefix = f"{room.id}/"
-    
+
     try:
-        # List objects in S3 bucket
-        response = s3_client.list_objects_v2(Bucket=bucket_name, Prefix=folder_prefix)
-        if "Contents" not in response:
-            raise HTTPException(status_code=404, detail="No files found in the room's S3 folder")
-        
-        # Filter for .log files
-        log_file = next(
-            (obj for obj in response["Contents"] if obj["Key"].endswith(".log")), None
-        )
-        if not log_file:
-            raise HTTPException(status_code=404, detail="No .log file found in the room's S3 folder")
-
-        # Fetch log file content
-        log_file_key = log_file["Key"]
-        log_file_content = s3_client.get_object(Bucket=bucket_name, Key=log_file_key)["Body"].read().decode("utf-8")
-
-
-        feedback_response=[]
-
-        prompt = """
-       Analyze the following conversation log and generate a detailed feedback report.
-        Answer Feedback: Analyze the user's response in detail, focusing on multiple factors but you should include only three major points which is much needed 
-
-        Overall Feedback: Summarize the quality of the response as one of the following: excellent, good, needs improvement, bad, or worst.
-        Response Format:
-        '"Keypoint which user lags": "<Feedback>" 
-        "keypoint which user lags": "<Feedback>", 
-        "Avoid Redundancy": "<Feedback>" },
-        "overall_feedback": "<Overall assessment>"}
-        """
-        
-        for line in log_file_content.splitlines():
-            if "AGENT:" in line:
-                # Extract the question part
-                current_question = line.split("AGENT:")[-1].strip()
-            elif "USER:" in line and current_question:
-                # Extract the answer part
-                user_answer = line.split("USER:")[-1].strip()
-                # Append the question-answer pair
-
-                chat_completion = groq_client.chat.completions.create(
-                    messages=[{"role": "user", "content": prompt+f" question : {current_question}, User_answer: {user_answer}"}],
-                    model="llama3-8b-8192",
-                )
-
-                # Extract analysis
-                feedback_report = chat_completion.choices[0].message.content
-
-
-                feedback_response.append({
-                    "question": current_question,
-                    "answer": user_answer,
-                    "feedback": feedback_report
-                })
-                # Reset current_question for the next pair
-                current_question = None
-
-        
-        return {
-            "room": {
-                "id": room.id,
-                "name": room.name,
-                "is_group": room.is_group,
-            },
-            "feedback_report": feedback_response,
-        }
+        log_file = await find_transcript(bucket_name, room.id)
+        # Returns the saved report straight away while the transcript is unchanged
+        report = None if refresh else await get_saved_report(db, room.id, log_file)
+    except TranscriptNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error analyzing log file: {str(e)}")
 
+    if report is not None:
+        return report
+    # Otherwise the LLM work happens in the background; poll the job for the result
+    return analysis_accepted(await analysis_queue.enqueue(room.id, refresh=refresh))
 
-async def createRoomHelper(room_name: str):
-    lkapi = api.LiveKitAPI(
-        settings.LIVEKIT_SERVER_URL,
-        settings.LIVEKIT_API_KEY,
-        settings.LIVEKIT_API_SECRET,
-        timeout=aiohttp.ClientTimeout(total=60 * 10)  # 10 minutes
-    )
 
+@router.post("/{room_id}/analyze-log", status_code=status.HTTP_202_ACCEPTED)
+async def enqueue_room_log_analysis(room_id: str, refresh: bool = False, db: AsyncSession = Depends(get_async_db)):
+    room = await get_room_with_members(db, room_id)
+    if not room:
+        raise HTTPException(status_code=404, detail="No room found for the user")
+    return analysis_accepted(await analysis_queue.enqueue(room.id, refresh=refresh))
+
+
+def stream_event(event: str, data: dict, format: str) -> str:
+    if format == "sse":
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    if event != "feedback":
+        data = {event: True, **data} if event == "done" else {"error": data["detail"]}
+    return json.dumps(data) + "\n"
+
+
+@router.get("/{room_id}/analyze-log/stream")
+async def stream_room_log_analysis(
+    room_id: str,
+    format: Literal["ndjson", "sse"] = "ndjson",
+    refresh: bool = False,
+    db: AsyncSession = Depends(get_async_db),
+):
+    # Sends every question/answer/feedback record as soon as its LLM call completes,
+    # in completion order; `position` gives its place in the transcript
+    room = await get_room_with_members(db, room_id)
+    if not room:
+        raise HTTPException(status_code=404, detail="No room found for the user")
+
+    bucket_name = os.environ.get("BUCKET_NAME")
     try:
-        room_info = await lkapi.room.create_room(
-            api.CreateRoomRequest(name=room_name),
-        )
-    
-        response_data = RoomInfoResponse(
-            id=room_info.sid,
-            name=room_info.name,
-            empty_timeout=room_info.empty_timeout,
-            creation_time=room_info.creation_time,
-            turn_password=room_info.turn_password,
-            departure_timeout=room_info.departure_timeout,
-            enabled_codecs=[codec.mime for codec in room_info.enabled_codecs]
+        # Resolved up front so a missing transcript is still a 404 rather than a broken stream
+        log_file = await find_transcript(bucket_name, room.id)
+    except TranscriptNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing log file: {str(e)}")
+
+    async def events():
+        count = 0
+        try:
+            # The request's session may be closed before the body is sent, so the stream has its own
+            async with AsyncSessionLocal() as stream_db:
+                async for record in stream_room_analysis(stream_db, room, bucket_name, log_file, refresh):
+                    count += 1
+                    yield stream_event("feedback", record, format)
+            yield stream_event("done", {"count": count}, format)
+        except Exception as e:
+            yield stream_event("error", {"detail": f"Error analyzing log file: {str(e)}"}, format)
+
+    if format == "sse":
+        return StreamingResponse(
+            events(),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
         )
+    return StreamingResponse(events(), media_type="application/x-ndjson", headers={"X-Accel-Buffering": "no"})
+
+
+@router.get("/analysis-jobs/{job_id}")
+async def get_analysis_job(job_id: str, db: AsyncSession = Depends(get_async_db)):
+    job = await analysis_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Analysis job not found or expired")
+    if job["status"] == DONE:
+        saved = await db.get(InterviewReport, job["room_id"])
+        job["result"] = saved.report if saved else None
+    return job
+
+
+@router.post("/storage-events")
+async def storage_events(request: Request, authorization: Optional[str] = Header(None)):
+    # S3/MinIO bucket notification webhook: a new transcript under "<room_id>/" starts its analysis
+    if not settings.STORAGE_WEBHOOK_TOKEN:
+        # Every accepted event can start paid LLM work, so there is no unauthenticated mode
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail="Storage webhook is not configured")
+    expected = f"Bearer {settings.STORAGE_WEBHOOK_TOKEN}".encode()
+    if not hmac.compare_digest((authorization or "").encode(), expected):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid webhook token")
+
+    event = await request.json()
+    jobs = {}
+    for record in event.get("Records", []):
+        if not record.get("eventName", "").startswith("s3:ObjectCreated"):
+            continue
+        bucket_name = record["s3"]["bucket"]["name"]
+        key = unquote_plus(record["s3"]["object"]["key"])
+        room_id, _, file_name = key.partition("/")
+        if not file_name:
+            continue
+        await invalidate_listing(bucket_name, f"{room_id}/")
+        if file_name.endswith(".log"):
+            jobs[room_id] = await analysis_queue.enqueue(room_id)
+    return {"jobs": jobs}
+
+
+def room_info_response(room_info) -> RoomInfoResponse:
+    return RoomInfoResponse(
+        id=room_info.sid,
+        name=room_info.name,
+        empty_timeout=room_info.empty_timeout,
+        creation_time=room_info.creation_time,
+        turn_password=room_info.turn_password,
+        departure_timeout=room_info.departure_timeout,
+        enabled_codecs=[codec.mime for codec in room_info.enabled_codecs]
+    )
 
-        return response_data
-    finally:
-        await lkapi.aclose()
 
-    
+async def createRoomHelper(room_name: str):
+    return room_info_response(await livekit_client.create_room(room_name))
 
 
 @router.post("/create/{room_name}")
-def create_room(room_name: str):
+async def create_room(room_name: str):
     try:
-        # Run the createRoomHelper coroutine in the main event loop
-        room_info = asyncio.run(createRoomHelper(room_name))
-        print(room_info)
+        room_info = await createRoomHelper(room_name)
         return {"message": "Room created successfully", "room_info": room_info}
     except Exception as e:
-        print(e)
+        logger.exception("Error creating room %s", room_name)
         raise HTTPException(status_code=500, detail=f"Error creating room: {str(e)}")
-    
+
 
 async def deleteRoomHelper(room_name: str):
-    lkapi = api.LiveKitAPI(
-        settings.LIVEKIT_SERVER_URL,
-        settings.LIVEKIT_API_KEY,
-        settings.LIVEKIT_API_SECRET,
-        timeout=aiohttp.ClientTimeout(total=60 * 10)  # 10 minutes
-    )
-    
-    try:
-        await lkapi.room.delete_room(
-            api.DeleteRoomRequest(room=room_name),
-        )
-    finally:
-        await lkapi.aclose()  # Ensure the client session closes
+    await livekit_client.delete_room(room_name)
 
 
 @router.delete("/delete/{room_name}")
 async def delete_room(room_name: str):
     try:
-        # Run the createRoomHelper coroutine in the main event loop
         results = await deleteRoomHelper(room_name)
         return results
     except Exception as e:
-        print(e)
+        logger.exception("Error deleting room %s", room_name)
         raise HTTPException(status_code=500, detail=f"{str(e)}")
+
+
+@router.post("/create-bulk", response_model=RoomBulkCreateResponse)
+async def create_rooms(request: RoomBulkRequest):
+    # Runs the creations concurrently over the shared LiveKit connection pool
+    results = await livekit_client.run_many(createRoomHelper, dict.fromkeys(request.names))
+    created, failed = [], []
+    for name, result in results:
+        if isinstance(result, Exception):
+            failed.append(RoomBulkFailure(name=name, error=str(result)))
+        else:
+            created.append(result)
+    return RoomBulkCreateResponse(created=created, failed=failed)
+
+
+@router.post("/delete-bulk", response_model=RoomBulkDeleteResponse)
+async def delete_rooms(request: RoomBulkRequest):
+    results = await livekit_client.run_many(deleteRoomHelper, dict.fromkeys(request.names))
+    deleted, failed = [], []
+    for name, result in results:
+        if isinstance(result, Exception):
+            failed.append(RoomBulkFailure(name=name, error=str(result)))
+        else:
+            deleted.append(name)
+    return RoomBulkDeleteResponse(deleted=deleted, failed=failed)
     
 
 
@@ -372,39 +562,50 @@ def getToken(reqbody : RoomTokenRequest,  db: Session = Depends(get_db)):
 
 
 
-# POST: Create or update interview request
+# POST: Create an interview request; the user's previous ones stay in their history
 @router.post("/interviews")
-def post_interview(interview: InterviewRequest, redis_client=Depends(get_redis_client)):
-    key = f"user:{interview.user_id}"
-    value = json.dumps(interview.dict())
-    redis_client.set(key, value)  # Upsert operation
-    return {"message": "Interview request saved successfully", "data": interview}
+async def post_interview(interview: InterviewRequest, store: InterviewStore = Depends(get_interview_store)):
+    record = await store.save(interview.dict())
+    return {"message": "Interview request saved successfully", "data": InterviewRecord(**record)}
+
+
+# POST: Save and/or fetch the latest interview request of many users in one round trip
+@router.post("/interviews/batch", response_model=InterviewBatchResponse)
+async def batch_interviews(batch: InterviewBatchRequest, store: InterviewStore = Depends(get_interview_store)):
+    if len(batch.upsert) + len(batch.fetch) > settings.INTERVIEW_BATCH_MAX:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=f"At most {settings.INTERVIEW_BATCH_MAX} interview requests per batch",
+        )
+    data = await store.batch((interview.dict() for interview in batch.upsert), batch.fetch)
+    return {"saved": len(batch.upsert), "data": data}
 
 
 # GET: Retrieve the latest interview request for a user
 @router.get("/interviews/{user_id}")
-def get_interview(user_id: str, redis_client=Depends(get_redis_client)):
-    key = f"user:{user_id}"
-    value = redis_client.get(key)
-    if value:
-        interview = json.loads(value)
-        return {"message": "Latest interview request retrieved", "data": interview}
+async def get_interview(user_id: str, store: InterviewStore = Depends(get_interview_store)):
+    interview = await store.latest(user_id)
+    if interview:
+        return {"message": "Latest interview request retrieved", "data": InterviewRecord(**interview)}
     else:
         raise HTTPException(status_code=404, detail="No interview request found for this user")
 
 
-# DELETE: Delete the interview request for a user
+# GET: A user's interview requests, newest first
+@router.get("/interviews/{user_id}/history", response_model=List[InterviewRecord])
+async def get_interview_history(
+    user_id: str,
+    limit: int = Query(20, ge=1, le=settings.INTERVIEW_HISTORY_MAX),
+    store: InterviewStore = Depends(get_interview_store),
+):
+    return await store.history(user_id, limit)
+
+
+# DELETE: Delete all interview requests of a user
 @router.delete("/interviews/{user_id}")
-def delete_interview(user_id: str, redis_client=Depends(get_redis_client)):
-    key = f"user:{user_id}"
-    result = redis_client.delete(key)
-    if result == 1:
+async def delete_interview(user_id: str, store: InterviewStore = Depends(get_interview_store)):
+    result = await store.delete_user(user_id)
+    if result:
         return {"message": "Interview request deleted successfully"}
     else:
         raise HTTPException(status_code=404, detail="No interview request found to delete")
-
-
-
-
-
-
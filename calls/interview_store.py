@@ -0,0 +1,169 @@
+import json
+import logging
+import time
+from typing import Dict, Iterable, List, Optional
+from uuid import uuid4
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class InterviewStore:
+    """Interview requests in Redis, with history.
+
+    Layout (also read by the LiveKit agents):
+
+        interview:request:{request_id}  hash of the request fields
+        interview:user:{user_id}        sorted set of request ids scored by creation time
+
+    The latest request is the top of the user's sorted set, O(log n). Keys
+    expire `ttl` seconds after the user's last request and each save trims
+    the set to the newest `max_history` requests, deleting the trimmed
+    hashes, so memory stays bounded.
+
+    Requests saved before this layout, one JSON string per user under
+    `user:{user_id}`, are moved over by `migrate_legacy`.
+    """
+
+    SAVE_SCRIPT = """
+    local request_key = KEYS[2] .. ARGV[1]
+    redis.call('HSET', request_key, unpack(ARGV, 5))
+    redis.call('EXPIRE', request_key, ARGV[3])
+    redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+    -- Ids whose hash has already expired
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', '(' .. (tonumber(ARGV[2]) - tonumber(ARGV[3])))
+    local trimmed = redis.call('ZRANGE', KEYS[1], 0, -(tonumber(ARGV[4]) + 1))
+    if #trimmed > 0 then
+        for _, request_id in ipairs(trimmed) do
+            redis.call('DEL', KEYS[2] .. request_id)
+        end
+        redis.call('ZREM', KEYS[1], unpack(trimmed))
+    end
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+    return ARGV[1]
+    """
+
+    LATEST_SCRIPT = """
+    local ids = redis.call('ZREVRANGE', KEYS[1], 0, 0)
+    if #ids == 0 then
+        return {}
+    end
+    return redis.call('HGETALL', KEYS[2] .. ids[1])
+    """
+
+    DELETE_SCRIPT = """
+    local ids = redis.call('ZRANGE', KEYS[1], 0, -1)
+    for _, request_id in ipairs(ids) do
+        redis.call('DEL', KEYS[2] .. request_id)
+    end
+    redis.call('DEL', KEYS[1])
+    return #ids
+    """
+
+    def __init__(
+        self,
+        client,
+        prefix: str = "interview",
+        ttl: int = settings.INTERVIEW_TTL_SECONDS,
+        max_history: int = settings.INTERVIEW_HISTORY_MAX,
+    ):
+        self.client = client
+        self.request_prefix = f"{prefix}:request:"
+        self.user_prefix = f"{prefix}:user:"
+        self.migrated_key = f"{prefix}:legacy_migrated"
+        self.ttl = ttl
+        self.max_history = max_history
+        self._save = client.register_script(self.SAVE_SCRIPT)
+        self._latest = client.register_script(self.LATEST_SCRIPT)
+        self._delete = client.register_script(self.DELETE_SCRIPT)
+
+    def _keys(self, user_id: str) -> List[str]:
+        return [f"{self.user_prefix}{user_id}", self.request_prefix]
+
+    @staticmethod
+    def _record(flat: list) -> Optional[dict]:
+        # HGETALL through EVAL comes back as [field, value, field, value, ...]
+        if not flat:
+            return None
+        return dict(zip(flat[::2], flat[1::2]))
+
+    async def _queue_save(self, pipe, interview: dict, created_at: Optional[float] = None) -> dict:
+        created_at = time.time() if created_at is None else created_at
+        record = {**interview, "request_id": uuid4().hex, "created_at": f"{created_at:.6f}"}
+        fields = [item for pair in record.items() for item in pair]
+        # Awaiting a script call on a pipeline only queues it
+        await self._save(
+            keys=self._keys(record["user_id"]),
+            args=[record["request_id"], record["created_at"], self.ttl, self.max_history, *fields],
+            client=pipe,
+        )
+        return record
+
+    async def save(self, interview: dict, created_at: Optional[float] = None) -> dict:
+        async with self.client.pipeline(transaction=False) as pipe:
+            record = await self._queue_save(pipe, interview, created_at)
+            await pipe.execute()
+        return record
+
+    async def migrate_legacy(self, legacy_prefix: str = "user:") -> int:
+        """Moves requests from the old `user:{user_id}` JSON strings into this layout, once.
+
+        The old keys carry no creation time, so each request is dated at
+        migration time, or just before the user's oldest request when newer
+        ones were already saved. Returns the number of requests moved.
+        """
+        if await self.client.exists(self.migrated_key):
+            return 0
+        moved = 0
+        async for key in self.client.scan_iter(match=f"{legacy_prefix}*", _type="STRING"):
+            # GETDEL hands each key to one worker only when several start together
+            value = await self.client.getdel(key)
+            if value is None:
+                continue
+            try:
+                interview = json.loads(value)
+                user_id = str(interview["user_id"])
+            except (ValueError, TypeError, KeyError):
+                logger.warning("Leaving %s alone: not a legacy interview request", key)
+                await self.client.set(key, value)
+                continue
+            oldest = await self.client.zrange(f"{self.user_prefix}{user_id}", 0, 0, withscores=True)
+            created_at = oldest[0][1] - 0.001 if oldest else time.time()
+            try:
+                await self.save({field: str(v) for field, v in interview.items() if v is not None}, created_at)
+            except Exception:
+                await self.client.set(key, value)
+                raise
+            moved += 1
+        await self.client.set(self.migrated_key, "1")
+        if moved:
+            logger.info("Moved %d interview requests to the %s layout", moved, self.user_prefix)
+        return moved
+
+    async def latest(self, user_id: str) -> Optional[dict]:
+        return self._record(await self._latest(keys=self._keys(user_id)))
+
+    async def batch(self, interviews: Iterable[dict], user_ids: Iterable[str]) -> Dict[str, Optional[dict]]:
+        """Saves `interviews`, then reads the latest request of each of `user_ids`, in one round trip."""
+        user_ids = list(user_ids)
+        async with self.client.pipeline(transaction=False) as pipe:
+            saved = [await self._queue_save(pipe, interview) for interview in interviews]
+            for user_id in user_ids:
+                await self._latest(keys=self._keys(user_id), client=pipe)
+            results = await pipe.execute()
+        return {user_id: self._record(flat) for user_id, flat in zip(user_ids, results[len(saved):])}
+
+    async def history(self, user_id: str, limit: int) -> List[dict]:
+        """Newest first; ids whose hash has already expired are skipped."""
+        request_ids = await self.client.zrevrange(f"{self.user_prefix}{user_id}", 0, limit - 1)
+        if not request_ids:
+            return []
+        async with self.client.pipeline(transaction=False) as pipe:
+            for request_id in request_ids:
+                pipe.hgetall(f"{self.request_prefix}{request_id}")
+            records = await pipe.execute()
+        return [record for record in records if record]
+
+    async def delete_user(self, user_id: str) -> int:
+        return await self._delete(keys=self._keys(user_id))
@@ -0,0 +1,114 @@
+import asyncio
+import logging
+import random
+from typing import Awaitable, Callable, Iterable, List, Optional, Tuple, TypeVar
+
+import aiohttp
+from livekit import api
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def is_retryable(error: Exception) -> bool:
+    if isinstance(error, (aiohttp.ClientConnectionError, asyncio.TimeoutError)):
+        return True
+    # Server side failures and overload; 4xx errors such as "not found" will not change on retry
+    return isinstance(error, api.TwirpError) and (error.status >= 500 or error.status == 429)
+
+
+class LiveKitClient:
+    """One LiveKitAPI for the whole process, over a keep-alive aiohttp session.
+
+    Started and stopped by the app lifespan; `call` applies the timeout and
+    retries transient failures with jittered exponential backoff.
+    """
+
+    def __init__(
+        self,
+        timeout: float = settings.LIVEKIT_TIMEOUT_SECONDS,
+        max_connections: int = settings.LIVEKIT_MAX_CONNECTIONS,
+        keepalive: int = settings.LIVEKIT_KEEPALIVE_SECONDS,
+        max_retries: int = settings.LIVEKIT_MAX_RETRIES,
+    ):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.keepalive = keepalive
+        self.max_retries = max_retries
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._api: Optional[api.LiveKitAPI] = None
+
+    async def start(self):
+        if self._api is not None:
+            return
+        if not settings.LIVEKIT_SERVER_URL:
+            logger.warning("LIVEKIT_URL is not set; LiveKit room operations will fail")
+            return
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections, keepalive_timeout=self.keepalive),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        self._api = api.LiveKitAPI(
+            settings.LIVEKIT_SERVER_URL,
+            settings.LIVEKIT_API_KEY,
+            settings.LIVEKIT_API_SECRET,
+            session=self._session,
+        )
+
+    async def stop(self):
+        if self._api is not None:
+            await self._api.aclose()
+            await self._session.close()
+            self._api = self._session = None
+
+    async def client(self) -> api.LiveKitAPI:
+        # Lazily started for code paths that run outside the app lifespan
+        if self._api is None:
+            await self.start()
+            if self._api is None:
+                raise RuntimeError("LIVEKIT_URL is not configured")
+        return self._api
+
+    async def call(self, operation: Callable[[api.LiveKitAPI], Awaitable[T]]) -> T:
+        lkapi = await self.client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                return await operation(lkapi)
+            except Exception as e:
+                if attempt == self.max_retries or not is_retryable(e):
+                    raise
+                delay = min(5, 0.2 * 2 ** attempt) * (0.5 + random.random())
+                logger.info("LiveKit call failed (%r), retrying in %.1fs", e, delay)
+                await asyncio.sleep(delay)
+
+    async def create_room(self, name: str):
+        return await self.call(lambda lkapi: lkapi.room.create_room(api.CreateRoomRequest(name=name)))
+
+    async def delete_room(self, name: str):
+        return await self.call(lambda lkapi: lkapi.room.delete_room(api.DeleteRoomRequest(room=name)))
+
+    async def run_many(
+        self,
+        operation: Callable[[str], Awaitable[T]],
+        names: Iterable[str],
+        concurrency: int = settings.LIVEKIT_BULK_CONCURRENCY,
+    ) -> List[Tuple[str, object]]:
+        """Runs `operation` for every name at most `concurrency` at a time.
+
+        Returns (name, result or exception) in input order.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(name: str):
+            async with semaphore:
+                return await operation(name)
+
+        names = list(names)
+        results = await asyncio.gather(*(run(name) for name in names), return_exceptions=True)
+        return list(zip(names, results))
+
+
+livekit_client = LiveKitClient()
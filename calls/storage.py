@@ -0,0 +1,151 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+import boto3
+from botocore.config import Config
+
+from cache import Cache, TTLCache
+from config import settings
+
+s3_client = boto3.client(
+    "s3",
+    endpoint_url=os.environ.get("STORAGE_ENDPOINT"),
+    aws_access_key_id=os.environ.get("STORAGE_ACCESS_KEY"),
+    aws_secret_access_key=os.environ.get("STORAGE_SECRET_KEY"),
+    region_name=os.environ.get("STORAGE_REGION"),
+    # One pooled HTTP connection per concurrent listing or object read
+    config=Config(max_pool_connections=settings.S3_LIST_CONCURRENCY + settings.S3_DOWNLOAD_CONCURRENCY),
+)
+
+listing_cache = Cache("s3-list", ttl=settings.S3_LIST_CACHE_TTL)
+# boto3 is blocking; listings run on their own pool so they neither block the
+# event loop nor queue behind the default executor
+_list_executor = ThreadPoolExecutor(max_workers=settings.S3_LIST_CONCURRENCY, thread_name_prefix="s3-list")
+_download_executor = ThreadPoolExecutor(max_workers=settings.S3_DOWNLOAD_CONCURRENCY, thread_name_prefix="s3-read")
+_inflight: Dict[str, asyncio.Future] = {}
+# Signing is local CPU work, so the in-process layer is enough
+presign_cache = TTLCache()
+
+
+def _list_all_objects(bucket: str, prefix: str) -> List[dict]:
+    # Follows continuation tokens, so prefixes with more than 1000 objects are complete
+    objects = []
+    paginator = s3_client.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+        for obj in page.get("Contents", []):
+            objects.append({
+                "Key": obj["Key"],
+                "Size": obj["Size"],
+                "LastModified": obj["LastModified"].isoformat(),
+                "ETag": obj.get("ETag"),
+            })
+    return objects
+
+
+async def _fetch(bucket: str, prefix: str, cache_key: str) -> List[dict]:
+    loop = asyncio.get_running_loop()
+    objects = await loop.run_in_executor(_list_executor, _list_all_objects, bucket, prefix)
+    await listing_cache.set(cache_key, objects)
+    return objects
+
+
+async def list_objects(bucket: str, prefix: str) -> List[dict]:
+    """Every object under `prefix`, served from the listing cache when fresh.
+
+    Safe to gather for many prefixes: at most S3_LIST_CONCURRENCY listings
+    hit S3 at once.
+    """
+    cache_key = f"{bucket}/{prefix}"
+    objects = await listing_cache.get(cache_key)
+    if objects is not None:
+        return objects
+
+    # Concurrent misses for the same prefix share one S3 listing
+    future = _inflight.get(cache_key)
+    if future is None:
+        future = asyncio.ensure_future(_fetch(bucket, prefix, cache_key))
+        _inflight[cache_key] = future
+        future.add_done_callback(lambda _: _inflight.pop(cache_key, None))
+    return await asyncio.shield(future)
+
+
+async def invalidate_listing(bucket: str, prefix: str):
+    await listing_cache.delete(f"{bucket}/{prefix}")
+
+
+async def get_object(bucket: str, key: str, byte_range: Optional[str] = None) -> dict:
+    """GetObject off the event loop; `byte_range` is an HTTP Range value such as "bytes=0-1023"."""
+    params = {"Bucket": bucket, "Key": key}
+    if byte_range:
+        params["Range"] = byte_range
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_download_executor, lambda: s3_client.get_object(**params))
+
+
+async def head_object(bucket: str, key: str) -> dict:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_download_executor, lambda: s3_client.head_object(Bucket=bucket, Key=key))
+
+
+async def iter_body(body, chunk_size: int = settings.S3_STREAM_CHUNK_SIZE) -> AsyncIterator[bytes]:
+    # Yields the object as it arrives, so a read never holds more than one chunk in memory
+    loop = asyncio.get_running_loop()
+    chunks = body.iter_chunks(chunk_size)
+    try:
+        while True:
+            chunk = await loop.run_in_executor(_download_executor, next, chunks, None)
+            if chunk is None:
+                break
+            yield chunk
+    finally:
+        body.close()
+
+
+def _sign(bucket: str, key: str, expires_in: int) -> Tuple[str, int]:
+    url = s3_client.generate_presigned_url(
+        "get_object",
+        Params={"Bucket": bucket, "Key": key},
+        ExpiresIn=expires_in,
+    )
+    return url, int(time.time()) + expires_in
+
+
+def _sign_many(bucket: str, keys: List[str], expires_in: int) -> List[Tuple[str, int]]:
+    return [_sign(bucket, key, expires_in) for key in keys]
+
+
+async def presign_many(
+    bucket: str, keys: Iterable[str], expires_in: Optional[int] = None
+) -> Dict[str, Tuple[str, int]]:
+    """Presigned GET URL and its expiry (unix time) for every key.
+
+    URLs are cached per (bucket, key, expiry bucket). Each expiry bucket is
+    `expires_in - PRESIGN_MIN_REMAINING_SECONDS` long, so a reused URL
+    always has at least PRESIGN_MIN_REMAINING_SECONDS of validity left and
+    clients see the same URL across refreshes.
+    """
+    expires_in = expires_in or settings.PRESIGN_EXPIRES_SECONDS
+    # Short-lived URLs still get half their lifetime of reuse
+    reuse_window = max(1, expires_in - min(settings.PRESIGN_MIN_REMAINING_SECONDS, expires_in // 2))
+    now = time.time()
+    window = int(now // reuse_window)
+
+    signed, missing = {}, []
+    for key in dict.fromkeys(keys):
+        entry = presign_cache.get((bucket, key, expires_in, window))
+        if entry is None:
+            missing.append(key)
+        else:
+            signed[key] = entry
+    if missing:
+        # Signing runs off the event loop so big batches do not stall it
+        loop = asyncio.get_running_loop()
+        entries = await loop.run_in_executor(_list_executor, _sign_many, bucket, missing, expires_in)
+        ttl = (window + 1) * reuse_window - now
+        for key, entry in zip(missing, entries):
+            presign_cache.set((bucket, key, expires_in, window), entry, ttl)
+            signed[key] = entry
+    return signed
@@ -1,13 +1,35 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from config import settings
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URL)
+pool_options = dict(
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+)
+
+# The two engines have separate pools; see DB_POOL_SIZE in config.py for the per-worker total
+engine = create_engine(
+    settings.SQLALCHEMY_DATABASE_URL,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    **pool_options,
+)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Async engine for `async def` routes, so queries do not block the event loop
+async_engine = create_async_engine(
+    settings.ASYNC_SQLALCHEMY_DATABASE_URL,
+    pool_size=settings.ASYNC_DB_POOL_SIZE,
+    max_overflow=settings.ASYNC_DB_MAX_OVERFLOW,
+    **pool_options,
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Dependency to get the DB session
 def get_db():
     db = SessionLocal()
@@ -16,3 +38,8 @@ def get_db():
     finally:
         db.close()
 
+
+# Dependency to get an async DB session, for `async def` routes
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,18 +1,174 @@
-from fastapi import APIRouter, Depends, HTTPException
+import base64
+import json
+from datetime import datetime
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
 from models import Job
-from schemas import JobCreate, JobUpdate
+from schemas import CandidateMatch, JobCreate, JobSearchResponse, JobUpdate
+from matching.engine import matching_engine
+from sqlalchemy import REAL, and_, cast, func, literal_column, select, true, tuple_, union_all
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 from sqlalchemy.orm import Session
 from database import get_db
 
 
 router = APIRouter()
 
+TOP_LOCATIONS = 10
+
+
+def encode_cursor(sort_value, job_id: str) -> str:
+    if isinstance(sort_value, datetime):
+        sort_value = sort_value.isoformat()
+    return base64.urlsafe_b64encode(json.dumps([sort_value, job_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str, order_by: str):
+    try:
+        sort_value, job_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        if sort_value is None:
+            # The previous page ended among the jobs without posted_at, which sort last
+            return None, str(job_id)
+        if order_by == "posted_at":
+            sort_value = datetime.fromisoformat(sort_value)
+        else:
+            sort_value = float(sort_value)
+        return sort_value, str(job_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("/search", response_model=JobSearchResponse)
+def search_jobs(
+    q: Optional[str] = None,
+    location: Optional[str] = None,
+    is_remote: Optional[bool] = None,
+    order_by: Optional[Literal["rank", "posted_at"]] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    if order_by is None or not q:
+        order_by = "rank" if q else "posted_at"
+
+    # Jobs matching the text query
+    columns = [Job.id, Job.title, Job.description, Job.location, Job.is_remote, Job.posted_at, Job.posted_by_id]
+    if q:
+        ts_query = func.websearch_to_tsquery("english", q)
+        rank = func.ts_rank_cd(Job.search_vector, ts_query)
+        text_ok = Job.search_vector.op("@@")(ts_query)
+    else:
+        rank = literal_column("NULL::real")
+        text_ok = true()
+
+    # Applied on top of the text match, so each facet can ignore its own filter
+    def filters(c):
+        location_ok = c.location == location if location is not None else true()
+        if is_remote is None:
+            remote_ok = true()
+        else:
+            remote_ok = c.is_remote.is_(True) if is_remote else c.is_remote.isnot(True)
+        return location_ok, remote_ok
+
+    sort_column = rank if order_by == "rank" else Job.posted_at
+    # Keyset predicates, each a contiguous run of the (sort DESC NULLS LAST, id DESC) order
+    runs = [true()]
+    if cursor:
+        sort_value, job_id = decode_cursor(cursor, order_by)
+        if sort_value is None:
+            runs = [and_(sort_column.is_(None), Job.id < job_id)]
+        else:
+            if order_by == "rank":
+                # Compare in real precision, as ranks were serialized from real values
+                sort_value = cast(sort_value, REAL)
+            runs = [tuple_(sort_column, Job.id) < tuple_(sort_value, job_id)]
+            if order_by == "posted_at":
+                # NULLs sort last and fail the tuple comparison, so they follow as a run of their own
+                runs.append(sort_column.is_(None))
+
+    # Keyset page straight off jobs, so posted_at order walks ix_jobs_posted_at_id_nulls_last
+    # and stops after limit + 1 rows; the extra row tells whether another page follows
+    location_ok, remote_ok = filters(Job)
+    pages = [
+        select(*columns, rank.label("rank"))
+        .where(text_ok, location_ok, remote_ok, run)
+        .order_by(sort_column.desc().nulls_last(), Job.id.desc())
+        .limit(limit + 1)
+        for run in runs
+    ]
+    if len(pages) == 1:
+        page = pages[0].subquery("page")
+    else:
+        both = union_all(*pages).subquery("runs")
+        page = (
+            select(both)
+            .order_by(both.c[order_by].desc().nulls_last(), both.c.id.desc())
+            .limit(limit + 1)
+            .subquery("page")
+        )
+    items = select(
+        func.coalesce(
+            func.json_agg(
+                aggregate_order_by(literal_column("page"), page.c[order_by].desc().nulls_last(), page.c.id.desc())
+            ),
+            literal_column("'[]'::json"),
+        )
+    ).scalar_subquery()
+
+    # Facets count the whole match set on every page
+    matched = select(Job.location, Job.is_remote).where(text_ok).cte("matched")
+    location_ok, remote_ok = filters(matched.c)
+
+    remote_counts = select(
+        func.json_build_object(
+            "remote", func.count().filter(matched.c.is_remote.is_(True)),
+            "onsite", func.count().filter(matched.c.is_remote.isnot(True)),
+        )
+    ).where(location_ok).scalar_subquery()
+
+    top_locations = (
+        select(matched.c.location, func.count().label("count"))
+        .where(remote_ok, matched.c.location.isnot(None))
+        .group_by(matched.c.location)
+        .order_by(func.count().desc(), matched.c.location)
+        .limit(TOP_LOCATIONS)
+        .subquery("top_locations")
+    )
+    locations = select(
+        func.coalesce(
+            func.json_agg(
+                aggregate_order_by(
+                    func.json_build_object("location", top_locations.c.location, "count", top_locations.c.count),
+                    top_locations.c.count.desc(),
+                    top_locations.c.location,
+                )
+            ),
+            literal_column("'[]'::json"),
+        )
+    ).scalar_subquery()
+
+    # Page and facets come back together in a single round trip
+    row = db.execute(select(items.label("items"), remote_counts.label("remote"), locations.label("locations"))).one()
+
+    hits = row.items[:limit]
+    next_cursor = None
+    if len(row.items) > limit:
+        last = hits[-1]
+        next_cursor = encode_cursor(last[order_by], last["id"])
+
+    return {
+        "items": hits,
+        "next_cursor": next_cursor,
+        "facets": {**row.remote, "locations": row.locations},
+    }
+
 @router.post("/", response_model=JobCreate)
 def create_job(job: JobCreate, db: Session = Depends(get_db)):
     db_job = Job(**job.dict())
     db.add(db_job)
     db.commit()
     db.refresh(db_job)
+    matching_engine.upsert_job(db_job.id, db_job.title, db_job.description)
     return db_job
 
 
@@ -33,6 +189,7 @@ def update_job(job_id: str, job: JobUpdate, db: Session = Depends(get_db)):
         setattr(db_job, key, value)
     db.commit()
     db.refresh(db_job)
+    matching_engine.upsert_job(db_job.id, db_job.title, db_job.description)
     return db_job
 
 
@@ -43,5 +200,15 @@ def delete_job(job_id: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Job not found")
     db.delete(db_job)
     db.commit()
+    matching_engine.remove_job(job_id)
     return {"message": "Job deleted successfully"}
 
+
+@router.get("/{job_id}/candidates", response_model=List[CandidateMatch])
+def job_candidates(job_id: str, top_k: int = Query(20, ge=1, le=500), db: Session = Depends(get_db)):
+    matching_engine.ensure_loaded(db)
+    candidates = matching_engine.candidates_for_job(job_id, top_k)
+    if candidates is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return candidates
+
@@ -1,22 +1,71 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
-from database import SessionLocal, engine, Base, get_db
+from database import SessionLocal, async_engine, engine, Base, get_db
 import models
 import schemas
+from migrations import run_upgrades
 from typing import List
 
 from auth import auth_routes
+from auth.passwords import password_hasher
 from users import user_routes
 from sockets import socket_routes
+from sockets.message_writer import message_writer
 from calls import call_routes
+from calls.analysis_queue import analysis_queue, run_worker
+from calls.livekit_pool import livekit_client
+from cache import create_cache_invalidations
+from config import settings
+from redis_pool import redis_pool
 from rooms import room_router
 from profiles import profile_routes
 from jobs import jobs_router
 from jobapplications import jobapplications_router
 
+logger = logging.getLogger(__name__)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await redis_pool.start()
+    try:
+        # One-off move of interview requests saved before the history layout; a no-op once done
+        await call_routes.interview_store.migrate_legacy()
+    except Exception as e:
+        logger.warning("Interview request migration failed, retried on the next start: %r", e)
+    cache_invalidations = None
+    if settings.CACHE_REDIS_ENABLED:
+        # Other workers' deletes, e.g. a principal dropped after a user update
+        cache_invalidations = create_cache_invalidations()
+        await cache_invalidations.start()
+    await socket_routes.manager.start()
+    await message_writer.start()
+    await livekit_client.start()
+    analysis_worker = None
+    if settings.ANALYSIS_QUEUE_BACKEND == "memory":
+        # Without Redis, analysis jobs run inside this process instead of worker.py
+        analysis_worker = asyncio.create_task(run_worker(analysis_queue))
+    yield
+    if analysis_worker:
+        analysis_worker.cancel()
+        await asyncio.gather(analysis_worker, return_exceptions=True)
+    await analysis_queue.close()
+    await socket_routes.manager.stop()
+    await message_writer.stop()
+    await livekit_client.stop()
+    password_hasher.shutdown()
+    await async_engine.dispose()
+    if cache_invalidations:
+        await cache_invalidations.stop()
+    await redis_pool.stop()
+
+
 # Initialize FastAPI app
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     '*'
@@ -29,9 +78,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # Response headers browser clients must be able to read: pagination, ranged downloads, 429/503 backoff
+    expose_headers=["X-Next-Cursor", "Content-Range", "Accept-Ranges", "Retry-After"],
 )
 # Create the database tables
 Base.metadata.create_all(bind=engine)
+run_upgrades(engine)
 
 
 app.include_router(auth_routes.router, prefix="/auth", tags=["auth"])
@@ -0,0 +1,373 @@
+import re
+import threading
+import time
+import logging
+from typing import Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from models import Job, JobSeekerProfile
+
+logger = logging.getLogger(__name__)
+
+# Keeps "c++", "c#" and "node.js" intact while dropping sentence punctuation
+TOKEN_RE = re.compile(r"[a-z0-9+#]+(?:\.[a-z0-9+#]+)*")
+MAX_NGRAM = 4
+
+
+def normalize(text: Optional[str]) -> str:
+    return " ".join(TOKEN_RE.findall((text or "").lower()))
+
+
+class SkillVocabulary:
+    """Maps normalized skill names to column indices of the skill matrices."""
+
+    def __init__(self):
+        self.index: Dict[str, int] = {}
+        self.terms: List[str] = []
+        self.max_tokens = 1
+
+    def __len__(self):
+        return len(self.terms)
+
+    def encode_skills(self, skills: Iterable[str]) -> Tuple[np.ndarray, List[int]]:
+        # Returns the columns of `skills` and the columns that were new to the vocabulary
+        columns, new_columns = set(), []
+        for skill in skills or []:
+            term = normalize(skill if isinstance(skill, str) else str(skill))
+            if not term:
+                continue
+            column = self.index.get(term)
+            if column is None:
+                column = len(self.terms)
+                self.index[term] = column
+                self.terms.append(term)
+                self.max_tokens = min(MAX_NGRAM, max(self.max_tokens, term.count(" ") + 1))
+                new_columns.append(column)
+            columns.add(column)
+        return np.array(sorted(columns), dtype=np.int32), new_columns
+
+    def encode_text(self, text: str) -> np.ndarray:
+        # `text` must already be normalized; looks up every n-gram up to the longest skill
+        tokens = text.split()
+        columns = set()
+        for n in range(1, self.max_tokens + 1):
+            for i in range(len(tokens) - n + 1):
+                column = self.index.get(" ".join(tokens[i:i + n]))
+                if column is not None:
+                    columns.add(column)
+        return np.array(sorted(columns), dtype=np.int32)
+
+
+def rows_to_csr(rows: List[np.ndarray]) -> Tuple[sparse.csr_matrix, np.ndarray]:
+    # Builds a binary CSR matrix straight from column index arrays; returns it with its row sizes
+    lengths = np.fromiter((len(r) for r in rows), dtype=np.int64, count=len(rows))
+    indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=indptr[1:])
+    indices = np.concatenate(rows).astype(np.int32) if rows else np.empty(0, dtype=np.int32)
+    n_cols = int(indices.max()) + 1 if len(indices) else 0
+    data = np.ones(len(indices), dtype=np.float32)
+    matrix = sparse.csr_matrix((data, indices, indptr), shape=(len(rows), n_cols))
+    return matrix, lengths.astype(np.float32)
+
+
+class SparseRows:
+    """Binary skill rows keyed by id: a CSR base matrix plus a small delta of changed rows.
+
+    Updates only tombstone the base row and write the delta, so they cost
+    O(row); the delta is folded back into the base once it grows past
+    `compact_ratio` of the base.
+    """
+
+    def __init__(self, compact_ratio: float = 0.05, min_compact: int = 1024):
+        self.compact_ratio = compact_ratio
+        self.min_compact = min_compact
+        self._build([], [])
+
+    def _build(self, keys: List[Hashable], rows: List[np.ndarray]):
+        self.base, self.base_sizes = rows_to_csr(rows)
+        self.base_keys = np.empty(len(keys), dtype=object)
+        self.base_keys[:] = keys
+        self.base_pos = {key: i for i, key in enumerate(keys)}
+        self.alive = np.ones(len(rows), dtype=bool)
+        self.delta: Dict[Hashable, np.ndarray] = {}
+        self._delta_matrix = None
+
+    def __len__(self):
+        return int(self.alive.sum()) + len(self.delta)
+
+    def rebuild(self, items: Iterable[Tuple[Hashable, np.ndarray]]):
+        keys, rows = [], []
+        for key, row in items:
+            keys.append(key)
+            rows.append(row)
+        self._build(keys, rows)
+
+    def get(self, key: Hashable) -> Optional[np.ndarray]:
+        if key in self.delta:
+            return self.delta[key]
+        pos = self.base_pos.get(key)
+        if pos is None or not self.alive[pos]:
+            return None
+        return self.base.indices[self.base.indptr[pos]:self.base.indptr[pos + 1]]
+
+    def set(self, key: Hashable, row: np.ndarray):
+        pos = self.base_pos.get(key)
+        if pos is not None:
+            self.alive[pos] = False
+        self.delta[key] = row
+        self._delta_matrix = None
+        if len(self.delta) > max(self.min_compact, self.compact_ratio * len(self.alive)):
+            self.compact()
+
+    def remove(self, key: Hashable):
+        pos = self.base_pos.get(key)
+        if pos is not None:
+            self.alive[pos] = False
+        if self.delta.pop(key, None) is not None:
+            self._delta_matrix = None
+
+    def compact(self):
+        keys = [self.base_keys[i] for i in np.flatnonzero(self.alive)]
+        rows = [self.get(key) for key in keys]
+        keys.extend(self.delta.keys())
+        rows.extend(self.delta.values())
+        self._build(keys, rows)
+
+    def _delta(self):
+        if self._delta_matrix is None:
+            delta_keys = list(self.delta.keys())
+            self._delta_matrix = (delta_keys, *rows_to_csr(list(self.delta.values())))
+        return self._delta_matrix
+
+    def dot(self, vector: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Overlap with `vector` and row sizes over base rows followed by delta rows.
+
+        Dead base rows score 0; map a position back to its id with `key_at`.
+        """
+        scores = self.base @ vector[:self.base.shape[1]]
+        scores[~self.alive] = 0
+        if not self.delta:
+            return scores, self.base_sizes
+        _, delta, delta_sizes = self._delta()
+        return (
+            np.concatenate([scores, delta @ vector[:delta.shape[1]]]),
+            np.concatenate([self.base_sizes, delta_sizes]),
+        )
+
+    def key_at(self, position: int) -> Hashable:
+        if position < len(self.base_keys):
+            return self.base_keys[position]
+        return self._delta()[0][position - len(self.base_keys)]
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    # Positive scores only, best first; argpartition keeps this O(n) for large n
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+class MatchingEngine:
+    """In-memory skill matching between job seeker profiles and jobs.
+
+    Profiles are encoded from their `skills` list; jobs are encoded by
+    finding vocabulary skills in their title and description. A score is the
+    fraction of the job's skills that the profile covers.
+
+    Once loaded, periodic reloads run on a background thread while queries
+    keep using the current matrices. Changes made during a reload are
+    journaled and replayed onto the new matrices before they are swapped in.
+    """
+
+    def __init__(
+        self,
+        refresh_seconds: int = settings.MATCHING_REFRESH_SECONDS,
+        session_factory: Callable[[], Session] = SessionLocal,
+    ):
+        self.refresh_seconds = refresh_seconds
+        self.session_factory = session_factory
+        self.vocabulary = SkillVocabulary()
+        self.profiles = SparseRows()
+        self.jobs = SparseRows()
+        self.profile_users: Dict[int, int] = {}
+        self.job_titles: Dict[str, str] = {}
+        self.job_texts: Dict[str, str] = {}
+        self.loaded_at: Optional[float] = None
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        # (method, args) of changes made while a reload reads the database; None when none runs
+        self._journal: Optional[List[Tuple[Callable, tuple]]] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self.loaded_at is not None
+
+    def load(self, profiles: Iterable[Tuple[int, int, list]], jobs: Iterable[Tuple[str, str, str]]):
+        vocabulary = SkillVocabulary()
+        profile_rows, profile_users = [], {}
+        for profile_id, user_id, skills in profiles:
+            profile_rows.append((profile_id, vocabulary.encode_skills(skills)[0]))
+            profile_users[profile_id] = user_id
+
+        job_rows, job_titles, job_texts = [], {}, {}
+        for job_id, title, description in jobs:
+            text = normalize(f"{title} {description}")
+            job_rows.append((job_id, vocabulary.encode_text(text)))
+            job_titles[job_id] = title
+            job_texts[job_id] = text
+
+        profile_matrix, job_matrix = SparseRows(), SparseRows()
+        profile_matrix.rebuild(profile_rows)
+        job_matrix.rebuild(job_rows)
+        with self._lock:
+            self.vocabulary = vocabulary
+            self.profiles, self.jobs = profile_matrix, job_matrix
+            self.profile_users, self.job_titles, self.job_texts = profile_users, job_titles, job_texts
+            self.loaded_at = time.monotonic()
+            journal, self._journal = self._journal, None
+            # The snapshot may predate these; applying them again is harmless
+            for method, args in journal or ():
+                method(*args)
+
+    def load_from_db(self, db: Session):
+        with self._lock:
+            self._journal = []
+        try:
+            profiles = db.execute(select(JobSeekerProfile.id, JobSeekerProfile.user_id, JobSeekerProfile.skills))
+            jobs = db.execute(select(Job.id, Job.title, Job.description))
+            self.load(profiles, jobs)
+        finally:
+            with self._lock:
+                self._journal = None
+
+    def _stale(self) -> bool:
+        return not self.loaded or time.monotonic() - self.loaded_at > self.refresh_seconds
+
+    def ensure_loaded(self, db: Session):
+        # Periodic full reloads pick up changes made through other workers
+        if not self.loaded:
+            with self._load_lock:
+                if not self.loaded:
+                    self.load_from_db(db)
+        elif self._stale() and self._load_lock.acquire(blocking=False):
+            threading.Thread(target=self._reload, name="matching-reload", daemon=True).start()
+
+    def _reload(self):
+        # Runs with _load_lock held, on its own session as the request's is closed when it ends
+        try:
+            if self._stale():
+                with self.session_factory() as db:
+                    self.load_from_db(db)
+        except Exception:
+            logger.exception("Matching engine reload failed; serving the previous matrices")
+            with self._lock:
+                # Retried after another refresh period rather than on every request
+                self.loaded_at = time.monotonic()
+        finally:
+            self._load_lock.release()
+
+    def _record(self, method: Callable, *args):
+        # Must be called with _lock held
+        if self._journal is not None:
+            self._journal.append((method, args))
+
+    def upsert_profile(self, profile_id: int, user_id: int, skills: list):
+        with self._lock:
+            self._record(self.upsert_profile, profile_id, user_id, skills)
+            if not self.loaded:
+                return  # Picked up by the first full load
+            row, new_columns = self.vocabulary.encode_skills(skills)
+            self.profiles.set(profile_id, row)
+            self.profile_users[profile_id] = user_id
+            if new_columns:
+                self._index_new_skills(new_columns)
+
+    def remove_profile(self, profile_id: int):
+        with self._lock:
+            self._record(self.remove_profile, profile_id)
+            self.profiles.remove(profile_id)
+            self.profile_users.pop(profile_id, None)
+
+    def upsert_job(self, job_id: str, title: str, description: str):
+        with self._lock:
+            self._record(self.upsert_job, job_id, title, description)
+            if not self.loaded:
+                return
+            text = normalize(f"{title} {description}")
+            self.jobs.set(job_id, self.vocabulary.encode_text(text))
+            self.job_titles[job_id] = title
+            self.job_texts[job_id] = text
+
+    def remove_job(self, job_id: str):
+        with self._lock:
+            self._record(self.remove_job, job_id)
+            self.jobs.remove(job_id)
+            self.job_titles.pop(job_id, None)
+            self.job_texts.pop(job_id, None)
+
+    def _index_new_skills(self, columns: List[int]):
+        # A skill seen for the first time may already appear in existing job descriptions
+        for column in columns:
+            needle = f" {self.vocabulary.terms[column]} "
+            for job_id, text in self.job_texts.items():
+                if needle in f" {text} ":
+                    row = self.jobs.get(job_id)
+                    self.jobs.set(job_id, np.union1d(row, [column]).astype(np.int32))
+
+    def _vector(self, row: np.ndarray) -> np.ndarray:
+        vector = np.zeros(len(self.vocabulary), dtype=np.float32)
+        vector[row] = 1.0
+        return vector
+
+    def _skills(self, columns: np.ndarray) -> List[str]:
+        return [self.vocabulary.terms[c] for c in columns]
+
+    def candidates_for_job(self, job_id: str, top_k: int) -> Optional[List[dict]]:
+        with self._lock:
+            job_row = self.jobs.get(job_id)
+            if job_row is None:
+                return None
+            if not len(job_row):
+                return []
+            overlap, _ = self.profiles.dot(self._vector(job_row))
+            scores = overlap / len(job_row)
+            matches = []
+            for i in top_k_indices(scores, top_k):
+                profile_id = self.profiles.key_at(i)
+                matches.append({
+                    "profile_id": int(profile_id),
+                    "user_id": self.profile_users.get(profile_id),
+                    "score": float(scores[i]),
+                    "matched_skills": self._skills(np.intersect1d(job_row, self.profiles.get(profile_id))),
+                })
+            return matches
+
+    def jobs_for_profile(self, profile_id: int, top_k: int) -> Optional[List[dict]]:
+        with self._lock:
+            profile_row = self.profiles.get(profile_id)
+            if profile_row is None:
+                return None
+            if not len(profile_row):
+                return []
+            overlap, sizes = self.jobs.dot(self._vector(profile_row))
+            scores = overlap / np.maximum(sizes, 1)
+            matches = []
+            for i in top_k_indices(scores, top_k):
+                job_id = self.jobs.key_at(i)
+                matches.append({
+                    "job_id": job_id,
+                    "title": self.job_titles.get(job_id),
+                    "score": float(scores[i]),
+                    "matched_skills": self._skills(np.intersect1d(profile_row, self.jobs.get(job_id))),
+                })
+            return matches
+
+
+matching_engine = MatchingEngine()
@@ -0,0 +1,60 @@
+from sqlalchemy import text
+
+from models import JOB_SEARCH_DOCUMENT
+
+# Idempotent DDL for schema changes `Base.metadata.create_all` cannot apply to
+# tables that already exist. Statements run in order on every startup.
+UPGRADES = [
+    # Job full-text search
+    f"ALTER TABLE jobs ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ({JOB_SEARCH_DOCUMENT}) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_jobs_search_vector ON jobs USING gin (search_vector)",
+    # Jobs without posted_at page last; replaces the NULLS FIRST ix_jobs_posted_at_id
+    "DROP INDEX IF EXISTS ix_jobs_posted_at_id",
+    "CREATE INDEX IF NOT EXISTS ix_jobs_posted_at_id_nulls_last ON jobs (posted_at DESC NULLS LAST, id DESC)",
+    "CREATE INDEX IF NOT EXISTS ix_jobs_location ON jobs (location)",
+    # JobSeekerProfile JSON -> JSONB, only rewriting columns that are still json
+    """
+    DO $$
+    DECLARE col text;
+    BEGIN
+        FOR col IN
+            SELECT column_name FROM information_schema.columns
+            WHERE table_name = 'job_seeker_profiles' AND data_type = 'json'
+        LOOP
+            EXECUTE format('ALTER TABLE job_seeker_profiles ALTER COLUMN %I TYPE jsonb USING %I::jsonb', col, col);
+        END LOOP;
+    END $$
+    """,
+    "CREATE INDEX IF NOT EXISTS ix_job_seeker_profiles_skills_lower ON job_seeker_profiles USING gin ((lower(skills::text)::jsonb))",
+    "CREATE INDEX IF NOT EXISTS ix_job_seeker_profiles_education ON job_seeker_profiles USING gin (education jsonb_path_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_job_seeker_profiles_work_experience ON job_seeker_profiles USING gin (work_experience jsonb_path_ops)",
+    # One-to-one room pair key; rooms already racing to duplicates keep the busiest one as canonical
+    "ALTER TABLE rooms ADD COLUMN IF NOT EXISTS min_user_id integer REFERENCES users (id)",
+    "ALTER TABLE rooms ADD COLUMN IF NOT EXISTS max_user_id integer REFERENCES users (id)",
+    """
+    WITH pairs AS (
+        SELECT ur.room_id, min(ur.user_id) AS low, max(ur.user_id) AS high
+        FROM user_rooms ur JOIN rooms r ON r.id = ur.room_id
+        WHERE r.is_group IS NOT TRUE AND r.min_user_id IS NULL
+        GROUP BY ur.room_id
+        HAVING count(*) = 2
+    ), canonical AS (
+        SELECT DISTINCT ON (p.low, p.high) p.room_id, p.low, p.high
+        FROM pairs p
+        WHERE NOT EXISTS (SELECT 1 FROM rooms c WHERE c.min_user_id = p.low AND c.max_user_id = p.high)
+        ORDER BY p.low, p.high, (SELECT count(*) FROM messages m WHERE m.room_id = p.room_id) DESC, p.room_id
+    )
+    UPDATE rooms SET min_user_id = canonical.low, max_user_id = canonical.high
+    FROM canonical WHERE rooms.id = canonical.room_id
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_rooms_dm_pair ON rooms (min_user_id, max_user_id) WHERE min_user_id IS NOT NULL",
+    "CREATE INDEX IF NOT EXISTS ix_messages_room_timestamp_id ON messages (room_id, timestamp DESC, id DESC)",
+    "ALTER TABLE messages ADD COLUMN IF NOT EXISTS seq integer",
+    "CREATE INDEX IF NOT EXISTS ix_messages_room_seq ON messages (room_id, seq)",
+]
+
+
+def run_upgrades(engine):
+    with engine.begin() as conn:
+        for statement in UPGRADES:
+            conn.execute(text(statement))
@@ -1,6 +1,6 @@
 from uuid import uuid4
-from sqlalchemy import Boolean, Column, Integer, String, ForeignKey, DateTime, Text, func
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy import Boolean, Column, Computed, Integer, Index, String, ForeignKey, DateTime, Text, cast, func
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR
 from sqlalchemy.orm import relationship
 from database import Base
 from datetime import datetime
@@ -33,6 +33,13 @@ class Room(Base):
     id = Column(String, primary_key=True, default=lambda: str(uuid4()), index=True)
     is_group = Column(Boolean, default=False)
     name = Column(String, nullable=True)  # Optional for group chats
+    # Canonical participant pair of a one-to-one room, lower id first
+    min_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+    max_user_id = Column(Integer, ForeignKey("users.id"), nullable=True)
+
+    __table_args__ = (
+        Index("ix_rooms_dm_pair", min_user_id, max_user_id, unique=True, postgresql_where=min_user_id.isnot(None)),
+    )
 
     # Relationships
     messages = relationship("Message", back_populates="room")
@@ -64,6 +71,14 @@ class Message(Base):
     timestamp = Column(DateTime, default=func.now())
     sender_id = Column(Integer, ForeignKey("users.id"))
     room_id = Column(String, ForeignKey("rooms.id"))
+    seq = Column(Integer, nullable=True)  # Per-room sequence number assigned at ingest
+
+    __table_args__ = (
+        # Keyset pagination of a room's history, newest first
+        Index("ix_messages_room_timestamp_id", room_id, timestamp.desc(), id.desc()),
+        # Not unique: a duplicate after a lost Redis counter must not wedge the message writer
+        Index("ix_messages_room_seq", room_id, seq),
+    )
 
     # Relationships
     sender = relationship("User", back_populates="messages")
@@ -74,14 +89,27 @@ class Message(Base):
             setattr(self, key, value)
 
 
+# Title matches rank above description matches; kept by Postgres as a generated column
+JOB_SEARCH_DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+)
+
+
 class Job(Base):
     __tablename__ = "jobs"
     id = Column(String, primary_key=True, default=lambda: str(uuid4()), index=True)
     title = Column(String, nullable=False)
     description = Column(Text, nullable=False)
-    location = Column(String, nullable=True)
+    location = Column(String, nullable=True, index=True)
     posted_at = Column(DateTime, default=func.now())
     is_remote = Column(Boolean, default=False)
+    search_vector = Column(TSVECTOR, Computed(JOB_SEARCH_DOCUMENT, persisted=True))
+
+    __table_args__ = (
+        Index("ix_jobs_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_jobs_posted_at_id_nulls_last", posted_at.desc().nulls_last(), id.desc()),
+    )
 
     # Relationships
     posted_by_id = Column(Integer, ForeignKey("users.id"))
@@ -112,6 +140,11 @@ class JobApplication(Base):
 
 
 
+def lowercase_jsonb(column):
+    # Lowercases every key and string inside a JSONB value; immutable, so it can back an index
+    return cast(func.lower(cast(column, Text)), JSONB)
+
+
 class JobSeekerProfile(Base):
     __tablename__ = "job_seeker_profiles"
     id = Column(Integer, primary_key=True, index=True)
@@ -124,20 +157,40 @@ class JobSeekerProfile(Base):
     address = Column(Text, nullable=True)
     resume_url = Column(String, nullable=True)
 
-    # Dynamic JSON fields
-    profiles = Column(JSON, default={})  # {"linkedin": "...", "github": "...", "portfolio": "..."}
-    education = Column(JSON, default=[])  # [{"institution": "...", "degree": "...", "year": "..."}]
-    work_experience = Column(JSON, default=[])  # [{"company": "...", "role": "...", "duration": "..."}]
-    projects = Column(JSON, default=[])  # [{"name": "...", "description": "...", "url": "..."}]
-    publications = Column(JSON, default=[])  # [{"title": "...", "link": "...", "date": "..."}]
-    certifications = Column(JSON, default=[])  # [{"name": "...", "authority": "...", "date": "..."}]
-    awards = Column(JSON, default=[])  # [{"name": "...", "reason": "...", "date": "..."}]
-    skills = Column(JSON, default=[])  # ["Python", "SQL", "AWS"]
+    # Dynamic JSONB fields
+    profiles = Column(JSONB, default={})  # {"linkedin": "...", "github": "...", "portfolio": "..."}
+    education = Column(JSONB, default=[])  # [{"institution": "...", "degree": "...", "year": "..."}]
+    work_experience = Column(JSONB, default=[])  # [{"company": "...", "role": "...", "duration": "..."}]
+    projects = Column(JSONB, default=[])  # [{"name": "...", "description": "...", "url": "..."}]
+    publications = Column(JSONB, default=[])  # [{"title": "...", "link": "...", "date": "..."}]
+    certifications = Column(JSONB, default=[])  # [{"name": "...", "authority": "...", "date": "..."}]
+    awards = Column(JSONB, default=[])  # [{"name": "...", "reason": "...", "date": "..."}]
+    skills = Column(JSONB, default=[])  # ["Python", "SQL", "AWS"]
 
     # Relationships
     user = relationship("User", back_populates="job_seeker_profile")
 
+    __table_args__ = (
+        # Case-insensitive skill filters (@> / ?|) run on this expression index
+        Index("ix_job_seeker_profiles_skills_lower", lowercase_jsonb(skills), postgresql_using="gin"),
+        Index("ix_job_seeker_profiles_education", education, postgresql_using="gin", postgresql_ops={"education": "jsonb_path_ops"}),
+        Index("ix_job_seeker_profiles_work_experience", work_experience, postgresql_using="gin", postgresql_ops={"work_experience": "jsonb_path_ops"}),
+    )
+
     def __init__(self, **kwargs):
         for key, value in kwargs.items():
             setattr(self, key, value)
 
+
+
+class InterviewReport(Base):
+    __tablename__ = "interview_reports"
+    room_id = Column(String, ForeignKey("rooms.id"), primary_key=True)
+    log_key = Column(String, nullable=False)
+    log_etag = Column(String, nullable=True)  # Report is reused while the transcript is unchanged
+    report = Column(JSONB, nullable=False)
+    created_at = Column(DateTime, default=func.now())
+
+    def __init__(self, **kwargs):
+        for key, value in kwargs.items():
+            setattr(self, key, value)
@@ -1,8 +1,12 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import array
 from sqlalchemy.orm import Session
-from models import JobSeekerProfile
-from schemas import JobSeekerProfileCreate, JobSeekerProfileUpdate
+from models import JobSeekerProfile, lowercase_jsonb
+from schemas import JobMatch, JobSeekerProfileCreate, JobSeekerProfileResponse, JobSeekerProfileUpdate
 from database import get_db
+from matching.engine import matching_engine
 
 
 router = APIRouter()
@@ -15,9 +19,35 @@ def create_profile(profile: JobSeekerProfileCreate, db: Session = Depends(get_db
     db.add(db_profile)
     db.commit()
     db.refresh(db_profile)
+    matching_engine.upsert_profile(db_profile.id, db_profile.user_id, db_profile.skills)
     return db_profile
 
 
+@router.get("/search", response_model=List[JobSeekerProfileResponse])
+def search_profiles(
+    skills: str = Query(..., description="Comma separated, e.g. python,aws"),
+    match: Literal["all", "any"] = "all",
+    limit: int = Query(50, ge=1, le=200),
+    after: Optional[int] = Query(None, description="id of the last profile of the previous page"),
+    db: Session = Depends(get_db),
+):
+    wanted = sorted({s.strip().lower() for s in skills.split(",") if s.strip()})
+    if not wanted:
+        raise HTTPException(status_code=400, detail="No skills given")
+
+    # Same expression as the GIN index, so the filter is an index scan
+    profile_skills = lowercase_jsonb(JobSeekerProfile.skills)
+    if match == "all":
+        condition = profile_skills.contains(wanted)  # @>
+    else:
+        condition = profile_skills.has_any(array(wanted))  # ?|
+
+    stmt = select(JobSeekerProfile).where(condition).order_by(JobSeekerProfile.id).limit(limit)
+    if after is not None:
+        stmt = stmt.where(JobSeekerProfile.id > after)
+    return db.scalars(stmt).all()
+
+
 @router.get("/{profile_id}", response_model=JobSeekerProfileCreate)
 def read_profile(profile_id: int, db: Session = Depends(get_db)):
     profile = db.query(JobSeekerProfile).filter(JobSeekerProfile.id == profile_id).first()
@@ -35,6 +65,7 @@ def update_profile(profile_id: int, profile: JobSeekerProfileUpdate, db: Session
         setattr(db_profile, key, value)
     db.commit()
     db.refresh(db_profile)
+    matching_engine.upsert_profile(db_profile.id, db_profile.user_id, db_profile.skills)
     return db_profile
 
 
@@ -45,5 +76,15 @@ def delete_profile(profile_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Profile not found")
     db.delete(db_profile)
     db.commit()
+    matching_engine.remove_profile(profile_id)
     return {"message": "Profile deleted successfully"}
 
+
+@router.get("/{profile_id}/recommended-jobs", response_model=List[JobMatch])
+def recommended_jobs(profile_id: int, top_k: int = Query(20, ge=1, le=500), db: Session = Depends(get_db)):
+    matching_engine.ensure_loaded(db)
+    jobs = matching_engine.jobs_for_profile(profile_id, top_k)
+    if jobs is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return jobs
+
@@ -0,0 +1,148 @@
+import logging
+import math
+import threading
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from config import settings
+from redis_pool import redis_pool
+
+logger = logging.getLogger(__name__)
+
+KeyFunc = Callable[[Request], Awaitable[Optional[str]]]
+
+
+def sliding_window(previous: int, current: int, elapsed: float, window: float, limit: int) -> Tuple[bool, float]:
+    """Sliding-window counter: the previous fixed window counts in proportion to its remaining overlap.
+
+    Returns (allowed, seconds until a request would be allowed).
+    """
+    weighted = previous * (window - elapsed) / window + current
+    if weighted < limit:
+        return True, 0.0
+    if current < limit:
+        # Wait for enough of the previous window to slide out
+        return False, window - elapsed - (limit - current) * window / previous
+    # Then the current window becomes the previous one and has to slide out too
+    return False, window - elapsed + window * (1 - limit / current)
+
+
+class RedisSlidingWindow:
+    """Atomic sliding-window counter shared by every API process; uses Redis TIME, not local clocks."""
+
+    SCRIPT = """
+    local limit = tonumber(ARGV[1])
+    local window = tonumber(ARGV[2])
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) * 1000 + math.floor(tonumber(time[2]) / 1000)
+    local index = math.floor(now / window)
+    local elapsed = now - index * window
+    local current_key = KEYS[1] .. ':' .. index
+    local previous = tonumber(redis.call('GET', KEYS[1] .. ':' .. (index - 1)) or '0')
+    local current = tonumber(redis.call('GET', current_key) or '0')
+    local weighted = previous * (window - elapsed) / window + current
+    if weighted >= limit then
+        local retry
+        if current < limit then
+            retry = window - elapsed - (limit - current) * window / previous
+        else
+            retry = window - elapsed + window * (1 - limit / current)
+        end
+        return {0, math.ceil(retry)}
+    end
+    redis.call('INCR', current_key)
+    redis.call('PEXPIRE', current_key, window * 2)
+    return {1, 0}
+    """
+
+    def __init__(self, client):
+        self._script = client.register_script(self.SCRIPT)
+
+    async def hit(self, key: str, limit: int, window: float) -> Tuple[bool, float]:
+        allowed, retry_ms = await self._script(keys=[key], args=[limit, int(window * 1000)])
+        return bool(allowed), retry_ms / 1000
+
+
+class MemorySlidingWindow:
+    """Per-process fallback with the same algorithm, used while Redis is unreachable."""
+
+    def __init__(self, max_keys: int = settings.CACHE_MAX_ENTRIES):
+        self.max_keys = max_keys
+        self._counts: Dict[Tuple[str, int], int] = {}
+        self._lock = threading.Lock()
+
+    def _prune(self, window_index: int):
+        # Only the current and previous windows matter
+        for stale in [k for k in self._counts if k[1] < window_index - 1]:
+            del self._counts[stale]
+
+    async def hit(self, key: str, limit: int, window: float) -> Tuple[bool, float]:
+        now = time.time()
+        index = int(now // window)
+        with self._lock:
+            if len(self._counts) > self.max_keys:
+                self._prune(index)
+            allowed, retry_after = sliding_window(
+                self._counts.get((key, index - 1), 0),
+                self._counts.get((key, index), 0),
+                now - index * window,
+                window,
+                limit,
+            )
+            if allowed:
+                self._counts[(key, index)] = self._counts.get((key, index), 0) + 1
+            return allowed, retry_after
+
+
+redis_window = RedisSlidingWindow(redis_pool.client)
+memory_window = MemorySlidingWindow()
+
+
+async def hit(key: str, limit: int, window: float) -> Tuple[bool, float]:
+    if settings.RATE_LIMIT_BACKEND == "redis" and redis_pool.healthy:
+        try:
+            return await redis_window.hit(key, limit, window)
+        except Exception as e:
+            logger.warning("Rate limiter falling back to in-process counters: %r", e)
+    return await memory_window.hit(key, limit, window)
+
+
+async def client_ip(request: Request) -> Optional[str]:
+    if settings.RATE_LIMIT_TRUST_FORWARDED:
+        forwarded = request.headers.get("x-forwarded-for")
+        if forwarded:
+            return forwarded.split(",")[0].strip()
+    return request.client.host if request.client else None
+
+
+async def body_email(request: Request) -> Optional[str]:
+    # Starlette caches the body, so the route can still parse it afterwards
+    try:
+        body = await request.json()
+    except ValueError:
+        return None
+    email = body.get("email") if isinstance(body, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def rate_limit(name: str, limit: int, window: float = settings.RATE_LIMIT_WINDOW_SECONDS, key: KeyFunc = client_ip):
+    """Dependency allowing `limit` requests per `window` seconds for each value of `key(request)`.
+
+    Requests over the limit get 429 with Retry-After before the route runs.
+    """
+
+    async def dependency(request: Request):
+        value = await key(request)
+        if value is None:
+            return
+        allowed, retry_after = await hit(f"ratelimit:{name}:{value}", limit, window)
+        if not allowed:
+            raise HTTPException(
+                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                detail="Too many requests, try again later",
+                headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+            )
+
+    return dependency
@@ -0,0 +1,169 @@
+import asyncio
+import logging
+from typing import Callable, Optional, Set
+
+import redis.asyncio as aioredis
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RedisPool:
+    """Process-wide redis.asyncio client over one shared connection pool.
+
+    Callers borrow connections per command instead of opening their own. A
+    background probe PINGs Redis every `probe_interval` seconds, so request
+    handlers can check `healthy` without paying an extra round trip.
+    """
+
+    def __init__(
+        self,
+        url: str = settings.REDIS_URL,
+        max_connections: int = settings.REDIS_MAX_CONNECTIONS,
+        pool_timeout: float = settings.REDIS_POOL_TIMEOUT,
+        probe_interval: float = settings.REDIS_HEALTH_CHECK_SECONDS,
+    ):
+        self.url = url
+        self.max_connections = max_connections
+        self.pool_timeout = pool_timeout
+        self.probe_interval = probe_interval
+        self.healthy = True  # Optimistic until the first probe says otherwise
+        self._client: Optional[aioredis.Redis] = None
+        self._probe_task: Optional[asyncio.Task] = None
+
+    @property
+    def client(self) -> aioredis.Redis:
+        if self._client is None:
+            # Blocking pool: when every connection is busy, callers wait up to
+            # `pool_timeout` for one instead of failing straight away
+            pool = aioredis.BlockingConnectionPool.from_url(
+                self.url,
+                max_connections=self.max_connections,
+                timeout=self.pool_timeout,
+                decode_responses=True,
+            )
+            self._client = aioredis.Redis(connection_pool=pool)
+        return self._client
+
+    async def ping(self) -> bool:
+        try:
+            return bool(await self.client.ping())
+        except Exception:
+            return False
+
+    async def _probe(self):
+        while True:
+            healthy = await self.ping()
+            if healthy != self.healthy:
+                if healthy:
+                    logger.info("Redis at %s is reachable again", self.url)
+                else:
+                    logger.warning("Redis at %s is unreachable", self.url)
+            self.healthy = healthy
+            await asyncio.sleep(self.probe_interval)
+
+    async def start(self):
+        if self._probe_task is None:
+            self._probe_task = asyncio.create_task(self._probe())
+
+    async def stop(self):
+        if self._probe_task is not None:
+            self._probe_task.cancel()
+            try:
+                await self._probe_task
+            except asyncio.CancelledError:
+                pass
+            self._probe_task = None
+        if self._client is not None:
+            await self._client.aclose()
+            await self._client.connection_pool.disconnect()
+            self._client = None
+
+
+class RedisSubscription:
+    """One pub/sub connection reading a changing set of channels.
+
+    `on_message(channel, data)` is called for every message. A failed read
+    is retried with exponential backoff on a fresh connection that
+    subscribes to the current channels again; messages published while
+    it is down are lost.
+    """
+
+    def __init__(self, client, on_message: Callable[[str, str], None], name: str):
+        self.client = client
+        self.on_message = on_message
+        self.name = name
+        self.channels: Set[str] = set()
+        self._pubsub = None
+        self._subscribed = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        if self.channels:
+            await self._pubsub.subscribe(*self.channels)
+        self._task = asyncio.create_task(self._reader())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._pubsub is not None:
+            await self._pubsub.aclose()
+            self._pubsub = None
+        self.channels.clear()
+        self._subscribed.clear()
+
+    async def subscribe(self, *channels: str):
+        self.channels.update(channels)
+        if self._pubsub is not None:
+            await self._pubsub.subscribe(*channels)
+        self._subscribed.set()
+
+    async def unsubscribe(self, *channels: str):
+        self.channels.difference_update(channels)
+        if self._pubsub is not None:
+            await self._pubsub.unsubscribe(*channels)
+        if not self.channels:
+            self._subscribed.clear()
+
+    async def _reader(self):
+        backoff = 0.5
+        while True:
+            # get_message fails on a pub/sub connection without subscriptions
+            await self._subscribed.wait()
+            try:
+                message = await self._pubsub.get_message(timeout=1.0)
+                backoff = 0.5
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning("%s lost its Redis subscription: %r", self.name, e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+                await self._resubscribe()
+                continue
+            if message is None or message["type"] != "message":
+                continue
+            channel, data = message["channel"], message["data"]
+            self.on_message(
+                channel.decode() if isinstance(channel, bytes) else channel,
+                data.decode() if isinstance(data, bytes) else data,
+            )
+
+    async def _resubscribe(self):
+        try:
+            await self._pubsub.aclose()
+            self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            if self.channels:
+                await self._pubsub.subscribe(*self.channels)
+        except Exception as e:
+            logger.warning("%s could not resubscribe: %r", self.name, e)
+
+
+redis_pool = RedisPool()
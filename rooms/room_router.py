@@ -1,43 +1,73 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from sqlalchemy import Integer, any_, bindparam, delete, select
+from sqlalchemy.dialects.postgresql import ARRAY, insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
-from database import get_db
+from typing import List, Optional
+from config import settings
+from database import get_async_db, get_db
 from models import User, Room, UserRoom
-from schemas import RoomCreate, RoomResponse, RoomParticipant
+from schemas import ChatMessagePage, RoomCreate, RoomResponse, RoomParticipant
+from sockets.history import message_history
 from uuid import uuid4
 
 router = APIRouter()
 
 
-def get_or_create_one_to_one_room(user1_id: int, user2_id: int, db: Session):
-    room = (
-        db.query(Room)
-        .join(UserRoom)
-        .filter(
-            UserRoom.user_id.in_([user1_id, user2_id]),
-            Room.is_group == False
+def user_ids_param(user_ids: List[int]):
+    # One array parameter, so the statement is the same whatever the number of ids
+    return bindparam("user_ids", sorted(set(user_ids)), type_=ARRAY(Integer))
+
+
+def require_users(user_ids: List[int], db: Session):
+    found = set(db.scalars(select(User.id).where(User.id == any_(user_ids_param(user_ids)))))
+    missing = sorted(set(user_ids) - found)
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"User {missing[0]} not found" if len(missing) == 1 else f"Users {', '.join(map(str, missing))} not found",
         )
-        .group_by(Room.id)
-        .having(func.count(Room.id) == 2)
-        .first()
-    )
-    
-    if not room:
-        room = Room(is_group=False)
-        db.add(room)
-        db.commit()
-        db.add_all([
-            UserRoom(user_id=user1_id, room_id=room.id),
-            UserRoom(user_id=user2_id, room_id=room.id)
-        ])
-        db.commit()
-    return room
 
 
+def add_memberships(room_id: str, user_ids: List[int], db: Session):
+    if user_ids:
+        db.execute(
+            insert(UserRoom)
+            .values([{"user_id": user_id, "room_id": room_id} for user_id in sorted(set(user_ids))])
+            .on_conflict_do_nothing()
+        )
+
+
+def release_pair(room: Room, removed_user_ids: List[int]):
+    # Without both users the room is no longer their one-to-one room; the next lookup creates a new one
+    if room.min_user_id is not None and set(removed_user_ids) & {room.min_user_id, room.max_user_id}:
+        room.min_user_id = room.max_user_id = None
+
+
+def get_or_create_one_to_one_room(user1_id: int, user2_id: int, db: Session):
+    low, high = sorted((user1_id, user2_id))
+    pair = (Room.min_user_id == low, Room.max_user_id == high)
+    room = db.query(Room).filter(*pair).first()
+    if room:
+        return room
+
+    # A concurrent request for the same pair makes this a no-op; its room is picked up below
+    room_id = db.scalar(
+        insert(Room)
+        .values(id=str(uuid4()), is_group=False, min_user_id=low, max_user_id=high)
+        .on_conflict_do_nothing(index_elements=[Room.min_user_id, Room.max_user_id], index_where=Room.min_user_id.isnot(None))
+        .returning(Room.id)
+    )
+    if room_id is not None:
+        add_memberships(room_id, [low, high], db)
+    db.commit()
+    return db.query(Room).filter(*pair).one()
+
 
 @router.post("/", response_model=RoomResponse)
 def create_room(user_ids: List[int], is_group: bool = False, name: str = None, db: Session = Depends(get_db)):
+    require_users(user_ids, db)
+
     # Handle one-to-one room creation
     if not is_group and len(user_ids) == 2:
         room = get_or_create_one_to_one_room(user_ids[0], user_ids[1], db)
@@ -46,34 +76,38 @@ def create_room(user_ids: List[int], is_group: bool = False, name: str = None, d
     # Create a new group room or non-duplicate one-to-one room if above conditions don't apply
     room = Room(id=str(uuid4()), is_group=is_group, name=name)
     db.add(room)
-    db.commit()
-
-    for user_id in user_ids:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User {user_id} not found")
-        db.add(UserRoom(user_id=user.id, room_id=room.id))
-
+    db.flush()
+    add_memberships(room.id, user_ids, db)
     db.commit()
     return room
 
 @router.post("/{room_id}/add_participants", response_model=RoomResponse)
 def add_participants(room_id: str, user_ids: List[int], db: Session = Depends(get_db)):
-    room = db.query(Room).filter(Room.id == room_id).first()
+    room = db.get(Room, room_id)
     if not room:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Room not found")
 
-    for user_id in user_ids:
-        user = db.query(User).filter(User.id == user_id).first()
-        if not user:
-            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"User {user_id} not found")
-        
-        # Check if the user is already in the room
-        if db.query(UserRoom).filter(UserRoom.user_id == user_id, UserRoom.room_id == room_id).first():
-            continue
+    # Existing members are skipped by the insert
+    require_users(user_ids, db)
+    add_memberships(room_id, user_ids, db)
+    if room.min_user_id is not None and set(user_ids) - {room.min_user_id, room.max_user_id}:
+        # A third member turns the one-to-one room into a group, so the pair gets a fresh room next time
+        room.min_user_id = room.max_user_id = None
+        room.is_group = True
+    db.commit()
+    return room
 
-        db.add(UserRoom(user_id=user_id, room_id=room_id))
 
+@router.post("/{room_id}/remove_participants", response_model=RoomResponse)
+def remove_participants(room_id: str, user_ids: List[int], db: Session = Depends(get_db)):
+    room = db.get(Room, room_id)
+    if not room:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Room not found")
+
+    # Ids that are not members are ignored
+    if user_ids:
+        db.execute(delete(UserRoom).where(UserRoom.room_id == room_id, UserRoom.user_id == any_(user_ids_param(user_ids))))
+    release_pair(room, user_ids)
     db.commit()
     return room
 
@@ -85,9 +119,9 @@ def remove_participant(room_id: str, user_id: int, db: Session = Depends(get_db)
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Participant not found in the room")
     
     db.delete(user_room)
-    db.commit()
-
     room = db.query(Room).filter(Room.id == room_id).first()
+    release_pair(room, [user_id])
+    db.commit()
     return room
 
 
@@ -99,6 +133,20 @@ def get_room(room_id: str, db: Session = Depends(get_db)):
     return room
 
 
+@router.get("/{room_id}/messages", response_model=ChatMessagePage)
+async def list_messages(
+    room_id: str,
+    before: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=settings.CHAT_HISTORY_PAGE_MAX),
+    db: AsyncSession = Depends(get_async_db),
+):
+    items, next_cursor = await message_history.page(db, room_id, before, limit)
+    # An empty first page is the only case that needs to tell a missing room from a quiet one
+    if not items and before is None and await db.get(Room, room_id) is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Room not found")
+    return {"items": items, "next_cursor": next_cursor}
+
+
 @router.get("/", response_model=List[RoomResponse])
 def list_rooms(db: Session = Depends(get_db)):
     return db.query(Room).all()
\ No newline at end of file
@@ -57,6 +57,20 @@ class Message(MessageBase):
         orm_mode = True
 
 
+class ChatMessage(BaseModel):
+    id: int
+    room_id: str
+    sender_id: Optional[int] = None
+    content: str
+    timestamp: datetime
+    seq: Optional[int] = None
+
+
+class ChatMessagePage(BaseModel):
+    items: List[ChatMessage]  # Newest first
+    next_cursor: Optional[str] = None  # Pass as `before` for the next older page
+
+
 class UserCreate(BaseModel):
     username: str
     email: str
@@ -66,9 +80,20 @@ class UserLogin(BaseModel):
     email: str
     password: str
 
+class CurrentUser(BaseModel):
+    id: int
+    username: str
+    email: str
+
+
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: Optional[str] = None
+
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
 
 
 
@@ -84,6 +109,11 @@ class UserBasicInfo(BaseModel):
         orm_mode = True
 
 
+class UserListItem(UserBasicInfo):
+    # Left empty when the listing is requested with include_profile=false
+    job_seeker_profile: Optional[JobSeekerProfileCreate] = None
+
+
 class RoomCreate(BaseModel):
     user_ids: List[int]
     is_group: bool = False
@@ -119,6 +149,36 @@ class RoomInfoResponse(BaseModel):
     enabled_codecs: list[str]
 
 
+class RoomBulkRequest(BaseModel):
+    names: List[str] = Field(..., min_length=1, max_length=500)
+
+
+class RoomBulkFailure(BaseModel):
+    name: str
+    error: str
+
+
+class RoomBulkCreateResponse(BaseModel):
+    created: List[RoomInfoResponse]
+    failed: List[RoomBulkFailure]
+
+
+class RoomBulkDeleteResponse(BaseModel):
+    deleted: List[str]
+    failed: List[RoomBulkFailure]
+
+
+class PresignRequest(BaseModel):
+    keys: List[str] = Field(..., min_length=1)
+    expires_in: Optional[int] = Field(None, ge=60, le=7 * 24 * 3600)  # Seconds; PRESIGN_EXPIRES_SECONDS if unset
+
+
+class PresignedUrl(BaseModel):
+    key: str
+    url: str
+    expires_at: datetime
+
+
 class RoomTokenRequest(BaseModel):
     identity: str
     name: str
@@ -155,6 +215,44 @@ class JobResponse(JobBase):
         orm_mode = True
 
 
+class JobSearchHit(JobBase):
+    id: str
+    posted_at: Optional[datetime] = None
+    posted_by_id: Optional[int] = None
+    rank: Optional[float] = None  # Only set for text queries
+
+
+class LocationFacet(BaseModel):
+    location: str
+    count: int
+
+
+class JobSearchFacets(BaseModel):
+    remote: int = 0
+    onsite: int = 0
+    locations: List[LocationFacet] = []
+
+
+class JobSearchResponse(BaseModel):
+    items: List[JobSearchHit]
+    next_cursor: Optional[str] = None
+    facets: JobSearchFacets
+
+
+class CandidateMatch(BaseModel):
+    profile_id: int
+    user_id: Optional[int] = None
+    score: float  # Fraction of the job's skills covered by the profile
+    matched_skills: List[str] = []
+
+
+class JobMatch(BaseModel):
+    job_id: str
+    title: Optional[str] = None
+    score: float
+    matched_skills: List[str] = []
+
+
 # --- JobApplication Schemas ---
 class JobApplicationBase(BaseModel):
     cover_letter: Optional[str]
@@ -188,3 +286,18 @@ class InterviewRequest(BaseModel):
     duration: str
     difficulty: str
 
+
+class InterviewRecord(InterviewRequest):
+    request_id: str
+    created_at: datetime
+
+
+class InterviewBatchRequest(BaseModel):
+    # Upserts are applied before fetches, so a user in both gets the new value back
+    upsert: List[InterviewRequest] = []
+    fetch: List[str] = []
+
+
+class InterviewBatchResponse(BaseModel):
+    saved: int
+    data: dict[str, Optional[InterviewRecord]]
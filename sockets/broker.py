@@ -0,0 +1,112 @@
+import logging
+from abc import ABC, abstractmethod
+from typing import Callable, Optional
+
+from config import settings
+from redis_pool import RedisSubscription
+
+logger = logging.getLogger(__name__)
+
+# Called with (room_id, message) for every message this node must deliver locally
+DeliverCallback = Callable[[str, str], None]
+
+
+class Broker(ABC):
+    """Carries room messages between the nodes serving the chat websocket.
+
+    `join`/`leave` tell the broker which rooms have local sockets on this
+    node, so it only receives traffic for rooms it can deliver.
+    """
+
+    @abstractmethod
+    async def start(self, deliver: DeliverCallback):
+        ...
+
+    @abstractmethod
+    async def stop(self):
+        ...
+
+    @abstractmethod
+    async def join(self, room_id: str):
+        ...
+
+    @abstractmethod
+    async def leave(self, room_id: str):
+        ...
+
+    @abstractmethod
+    async def publish(self, room_id: str, message: str):
+        ...
+
+
+class InProcessBroker(Broker):
+    """Single-worker backend: publishing delivers straight to local sockets."""
+
+    def __init__(self):
+        self._deliver: Optional[DeliverCallback] = None
+
+    async def start(self, deliver: DeliverCallback):
+        self._deliver = deliver
+
+    async def stop(self):
+        self._deliver = None
+
+    async def join(self, room_id: str):
+        pass
+
+    async def leave(self, room_id: str):
+        pass
+
+    async def publish(self, room_id: str, message: str):
+        if self._deliver:
+            self._deliver(room_id, message)
+
+
+class RedisBroker(Broker):
+    """Redis pub/sub backend.
+
+    Every node holds a single pub/sub connection and multiplexes the channels
+    of all rooms it currently serves over it. Messages published by this node
+    come back through the same subscription, so local and remote members see
+    one ordering per room.
+    """
+
+    def __init__(self, client, channel_prefix: str = settings.CHAT_CHANNEL_PREFIX):
+        self.client = client
+        self.channel_prefix = channel_prefix
+        self._deliver: Optional[DeliverCallback] = None
+        self._subscription = RedisSubscription(client, self._on_message, "Chat broker")
+
+    def _channel(self, room_id: str) -> str:
+        return f"{self.channel_prefix}{room_id}"
+
+    def _on_message(self, channel: str, data: str):
+        self._deliver(channel[len(self.channel_prefix):], data)
+
+    async def start(self, deliver: DeliverCallback):
+        self._deliver = deliver
+        await self._subscription.start()
+
+    async def stop(self):
+        await self._subscription.stop()
+
+    async def join(self, room_id: str):
+        channel = self._channel(room_id)
+        if channel not in self._subscription.channels:
+            await self._subscription.subscribe(channel)
+
+    async def leave(self, room_id: str):
+        channel = self._channel(room_id)
+        if channel in self._subscription.channels:
+            await self._subscription.unsubscribe(channel)
+
+    async def publish(self, room_id: str, message: str):
+        await self.client.publish(self._channel(room_id), message)
+
+
+def create_broker() -> Broker:
+    if settings.CHAT_BROKER == "redis":
+        from redis_pool import redis_pool
+
+        return RedisBroker(redis_pool.client)
+    return InProcessBroker()
@@ -0,0 +1,132 @@
+import asyncio
+import json
+import logging
+from collections import deque
+from enum import Enum
+from typing import Callable, Deque, Optional
+
+from fastapi import WebSocket
+
+logger = logging.getLogger(__name__)
+
+# Replaces the queue of a JSON-framed socket that fell behind: reconnect with the last seq seen
+RESYNC_NOTICE = json.dumps({"seq": None, "resync": True, "text": "Messages were dropped, reconnect with since_seq"})
+
+
+class BackpressurePolicy(str, Enum):
+    DROP_OLDEST = "drop_oldest"  # Discard the oldest queued frame to make room
+    COALESCE = "coalesce"        # Merge queued frames into one until a byte budget is hit
+    DISCONNECT = "disconnect"    # Close the socket of a consumer that cannot keep up
+
+
+class SocketSender:
+    """Owns the outbound queue and writer task of a single WebSocket.
+
+    `offer` never awaits, so a broadcast only pays for an append per member;
+    the actual `send_text` happens on the writer task of each socket.
+
+    With `json_frames`, every message is a JSON object: coalescing merges
+    them into one JSON array, and dropping replaces the backlog with
+    RESYNC_NOTICE so the client knows to replay the gap.
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        max_queue: int,
+        policy: BackpressurePolicy,
+        send_timeout: float,
+        max_coalesced_bytes: int,
+        on_close: Optional[Callable[["SocketSender"], None]] = None,
+        json_frames: bool = False,
+    ):
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.max_coalesced_bytes = max_coalesced_bytes
+        self.on_close = on_close
+        self.json_frames = json_frames
+        self.dropped = 0
+        self.closed = False
+        self._queue: Deque[str] = deque()
+        self._ready = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._writer())
+
+    def offer(self, message: str) -> bool:
+        if self.closed:
+            return False
+        if len(self._queue) < self.max_queue:
+            self._queue.append(message)
+        elif self.policy == BackpressurePolicy.DROP_OLDEST:
+            if self.json_frames:
+                # The frames after a gap are useless to the client until it has replayed it
+                self.dropped += len(self._queue) - (self._queue[0] == RESYNC_NOTICE) + 1
+                self._queue.clear()
+                self._queue.append(RESYNC_NOTICE)
+            else:
+                self._queue.popleft()
+                self._queue.append(message)
+                self.dropped += 1
+        elif self.policy == BackpressurePolicy.COALESCE:
+            merged = self._merge([*self._queue, message])
+            if len(merged) > self.max_coalesced_bytes:
+                self._close_slow_consumer()
+                return False
+            self._queue.clear()
+            self._queue.append(merged)
+        else:
+            self._close_slow_consumer()
+            return False
+        self._ready.set()
+        return True
+
+    def _merge(self, messages) -> str:
+        if not self.json_frames:
+            return "\n".join(messages)
+        # Objects and already merged arrays flatten into one JSON array
+        return "[" + ",".join(m[1:-1] if m.startswith("[") else m for m in messages) + "]"
+
+    async def _writer(self):
+        try:
+            while not self.closed:
+                await self._ready.wait()
+                while self._queue:
+                    message = self._queue.popleft()
+                    await asyncio.wait_for(self.websocket.send_text(message), self.send_timeout)
+                self._ready.clear()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Timed out or half-dead socket: stop writing and let the manager forget it
+            logger.info("Dropping websocket consumer: %r", e)
+            self._close_slow_consumer()
+
+    def _close_slow_consumer(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._queue.clear()
+        asyncio.create_task(self._close_socket())
+        if self.on_close:
+            self.on_close(self)
+
+    async def _close_socket(self):
+        try:
+            # 1013: try again later
+            await self.websocket.close(code=1013)
+        except Exception:
+            pass
+
+    async def stop(self):
+        self.closed = True
+        self._queue.clear()
+        if self._task and self._task is not asyncio.current_task():
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
@@ -0,0 +1,149 @@
+import base64
+import json
+import logging
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import settings
+from models import Message
+from redis_pool import redis_pool
+
+logger = logging.getLogger(__name__)
+
+
+def encode_cursor(timestamp: datetime, message_id: int) -> str:
+    return base64.urlsafe_b64encode(json.dumps([timestamp.isoformat(), message_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        timestamp, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(timestamp), int(message_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def message_record(row) -> dict:
+    return {
+        "id": row.id,
+        "room_id": row.room_id,
+        "sender_id": row.sender_id,
+        "content": row.content,
+        "timestamp": row.timestamp.isoformat(),
+        "seq": row.seq,
+    }
+
+
+def newest_first(record: dict):
+    return record["timestamp"], record["id"]
+
+
+class MessageHistory:
+    """Keyset-paginated chat history, newest first.
+
+    Pages walk the (room_id, timestamp DESC, id DESC) index. The latest
+    `tail_size` messages of each room are also kept in a Redis list, so the
+    first page a reconnecting client asks for usually skips the database.
+
+    A list is only ever filled with a complete tail: the message writer
+    bumps a per-room version with every append, and a fill read from the
+    database is dropped if the version moved while it ran.
+    """
+
+    FILL = """
+    if (redis.call('GET', KEYS[2]) or '') ~= ARGV[1] then
+        return 0
+    end
+    redis.call('DEL', KEYS[1])
+    redis.call('RPUSH', KEYS[1], unpack(ARGV, 3))
+    redis.call('EXPIRE', KEYS[1], ARGV[2])
+    return 1
+    """
+
+    def __init__(
+        self,
+        client,
+        prefix: str = "chat:tail",
+        tail_size: int = settings.CHAT_TAIL_SIZE,
+        ttl: int = settings.CHAT_TAIL_TTL_SECONDS,
+    ):
+        self.client = client
+        self.prefix = prefix
+        self.tail_size = tail_size
+        self.ttl = ttl
+        self._fill = client.register_script(self.FILL)
+
+    def _keys(self, room_id: str) -> Tuple[str, str]:
+        return f"{self.prefix}:{room_id}", f"{self.prefix}:{room_id}:version"
+
+    def _use_tail(self) -> bool:
+        return self.tail_size > 0 and redis_pool.healthy
+
+    async def page(self, db: AsyncSession, room_id: str, before: Optional[str], limit: int) -> Tuple[List[dict], Optional[str]]:
+        """Returns up to `limit` messages older than the `before` cursor, and the cursor of the next page."""
+        if before is None and limit < self.tail_size and self._use_tail():
+            try:
+                records = await self._read_tail(db, room_id, limit)
+                return self._paginate(records, limit)
+            except Exception as e:
+                logger.warning("Chat history tail unavailable for room %s: %r", room_id, e)
+
+        query = select(Message).where(Message.room_id == room_id)
+        if before is not None:
+            query = query.where(tuple_(Message.timestamp, Message.id) < tuple_(*decode_cursor(before)))
+        rows = await db.scalars(query.order_by(Message.timestamp.desc(), Message.id.desc()).limit(limit + 1))
+        return self._paginate([message_record(row) for row in rows], limit)
+
+    def _paginate(self, records: List[dict], limit: int) -> Tuple[List[dict], Optional[str]]:
+        # One extra record tells whether another page follows
+        items = records[:limit]
+        next_cursor = None
+        if len(records) > limit:
+            next_cursor = encode_cursor(datetime.fromisoformat(items[-1]["timestamp"]), items[-1]["id"])
+        return items, next_cursor
+
+    async def _read_tail(self, db: AsyncSession, room_id: str, limit: int) -> List[dict]:
+        key, version_key = self._keys(room_id)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.lrange(key, 0, limit)
+            pipe.get(version_key)
+            cached, version = await pipe.execute()
+        if cached:
+            # Writers on different processes may append out of order
+            return sorted((json.loads(item) for item in cached), key=newest_first, reverse=True)
+
+        rows = await db.scalars(
+            select(Message)
+            .where(Message.room_id == room_id)
+            .order_by(Message.timestamp.desc(), Message.id.desc())
+            .limit(self.tail_size)
+        )
+        records = [message_record(row) for row in rows]
+        if records:
+            await self._fill(keys=[key, version_key], args=[version or "", self.ttl, *(json.dumps(r) for r in records)])
+        return records[: limit + 1]
+
+    async def record(self, records: List[dict]):
+        """Appends newly stored messages to the tails that are cached; called by the message writer."""
+        if not self._use_tail():
+            return
+        by_room: Dict[str, List[dict]] = {}
+        for record in sorted(records, key=newest_first):
+            by_room.setdefault(record["room_id"], []).append(record)
+        async with self.client.pipeline(transaction=True) as pipe:
+            for room_id, room_records in by_room.items():
+                key, version_key = self._keys(room_id)
+                pipe.incr(version_key)
+                pipe.expire(version_key, self.ttl)
+                # Only extends lists that already hold a complete tail
+                pipe.lpushx(key, *(json.dumps(r) for r in room_records))
+                pipe.ltrim(key, 0, self.tail_size - 1)
+                pipe.expire(key, self.ttl)
+            await pipe.execute()
+
+
+message_history = MessageHistory(redis_pool.client)
@@ -0,0 +1,166 @@
+import asyncio
+import json
+import logging
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError
+
+from config import settings
+from database import AsyncSessionLocal
+from models import Message
+from redis_pool import redis_pool
+from .history import message_history, message_record
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def is_transient(error: Exception) -> bool:
+    # Lost connections and timeouts succeed on retry; constraint and data errors never do
+    if isinstance(error, (OperationalError, InterfaceError)):
+        return True
+    if isinstance(error, DBAPIError):
+        return error.connection_invalidated
+    return isinstance(error, (OSError, asyncio.TimeoutError))
+
+
+class MessageWriter:
+    """Write-behind persistence for chat messages.
+
+    Sockets hand rows to `submit` and move on; a background task collects
+    them into batches of up to `batch_size` rows or `flush_interval` seconds,
+    whichever comes first, and stores each batch with one multi-row INSERT on the async engine.
+
+    At most `max_pending` queued rows plus one in-flight batch are held in
+    memory, which bounds what a crash can lose. When the queue is full,
+    `submit` waits, slowing down only the sockets that are producing.
+
+    Only transient errors are retried. A batch rejected for its contents is
+    stored row by row, and the rows that still fail are logged and pushed
+    to the `dead_letter_key` Redis list, so one bad message cannot stall
+    the queue.
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = settings.CHAT_WRITE_FLUSH_MS / 1000,
+        batch_size: int = settings.CHAT_WRITE_BATCH_SIZE,
+        max_pending: int = settings.CHAT_WRITE_MAX_PENDING,
+        session_factory=AsyncSessionLocal,
+        dead_letter_key: str = "chat:dead_letter",
+        dead_letter_max: int = settings.CHAT_WRITE_DEAD_LETTER_MAX,
+    ):
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.session_factory = session_factory
+        self.dead_letter_key = dead_letter_key
+        self.dead_letter_max = dead_letter_max
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    async def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._queue = asyncio.Queue(maxsize=self.max_pending)
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Flushes everything submitted so far before returning
+        if self._task is None:
+            return
+        # Stops retrying failed batches so shutdown cannot hang on a dead database
+        self._stopping = True
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+
+    async def submit(self, sender_id: int, room_id: str, content: str, seq: Optional[int] = None):
+        await self.start()
+        await self._queue.put({"sender_id": sender_id, "room_id": room_id, "content": content, "seq": seq})
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            row = await self._queue.get()
+            if row is _STOP:
+                break
+            batch = [row]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                batch.append(row)
+            await self._flush(batch, retry=not stopping)
+
+    async def _flush(self, batch: List[dict], retry: bool = True):
+        stored = await self._store(batch, retry)
+        if not stored:
+            return
+        # Outside the retry loop: the rows are stored, a cache failure must not insert them again
+        try:
+            await message_history.record([message_record(row) for row in stored])
+        except Exception as e:
+            logger.warning("Could not append %d chat messages to the history tail: %r", len(stored), e)
+
+    async def _store(self, batch: List[dict], retry: bool) -> list:
+        backoff = 0.1
+        while True:
+            try:
+                return await self._insert(batch)
+            except Exception as e:
+                if not is_transient(e):
+                    if len(batch) == 1:
+                        await self._dead_letter(batch[0], e)
+                        return []
+                    # One bad row fails the whole statement; find it and keep the rest
+                    logger.warning("Chat message flush of %d rows rejected, storing them one by one: %r", len(batch), e)
+                    stored = []
+                    for row in batch:
+                        stored.extend(await self._store([row], retry))
+                    return stored
+                if not retry or self._stopping:
+                    logger.error("Dropping %d chat messages, final flush failed: %r", len(batch), e)
+                    return []
+                logger.warning("Chat message flush of %d rows failed, retrying: %r", len(batch), e)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 5)
+
+    async def _dead_letter(self, row: dict, error: Exception):
+        logger.error("Chat message rejected by the database, dead-lettered: %r (%r)", row, error)
+        if not redis_pool.healthy:
+            return
+        entry = json.dumps({"row": row, "error": repr(error)}, default=str)
+        try:
+            async with redis_pool.client.pipeline(transaction=True) as pipe:
+                pipe.lpush(self.dead_letter_key, entry)
+                pipe.ltrim(self.dead_letter_key, 0, self.dead_letter_max - 1)
+                await pipe.execute()
+        except Exception as e:
+            logger.warning("Could not push a chat message to the dead-letter list: %r", e)
+
+    async def _insert(self, batch: List[dict]):
+        async with self.session_factory() as db:
+            result = await db.execute(
+                insert(Message)
+                .values(batch)
+                .returning(Message.id, Message.room_id, Message.sender_id, Message.content, Message.timestamp, Message.seq)
+            )
+            stored = result.all()
+            await db.commit()
+        return stored
+
+
+message_writer = MessageWriter()
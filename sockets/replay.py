@@ -0,0 +1,160 @@
+import bisect
+import json
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from config import settings
+from database import AsyncSessionLocal
+from models import Message, User
+
+# (seq, frame) pairs, oldest first; a gap notice has no seq
+Frames = List[Tuple[Optional[int], str]]
+
+
+def encode_frame(seq: Optional[int], text: str) -> str:
+    # What sequenced sockets receive; also the payload carried by the broker
+    return json.dumps({"seq": seq, "text": text})
+
+
+def gap_frame(room_id: str, after_seq: int, before_seq: int) -> str:
+    # Replay skipped the messages in between; the client pages them in from the history endpoint
+    return json.dumps({
+        "seq": None,
+        "gap": {"after_seq": after_seq, "before_seq": before_seq},
+        "text": f"Older messages were skipped, load them from /rooms/{room_id}/messages",
+    })
+
+
+def decode_frame(message: str) -> Tuple[Optional[int], str]:
+    try:
+        frame = json.loads(message)
+        return frame["seq"], frame["text"]
+    except (ValueError, TypeError, KeyError):
+        # Plain string from a node that predates sequence numbers
+        return None, message
+
+
+class ReplayBuffer:
+    """The last `maxlen` sequenced frames of one room, kept sorted by seq.
+
+    Only covers messages this node received while it had sockets in the
+    room, so `since` says when it cannot answer on its own.
+    """
+
+    def __init__(self, maxlen: int = settings.CHAT_REPLAY_BUFFER_SIZE):
+        self._seqs: Deque[int] = deque(maxlen=maxlen)
+        self._frames: Deque[str] = deque(maxlen=maxlen)
+
+    def append(self, seq: int, frame: str):
+        if not self._seqs or seq > self._seqs[-1]:
+            self._seqs.append(seq)
+            self._frames.append(frame)
+            return
+        # Nodes publish concurrently, so a lower seq can arrive late
+        index = bisect.bisect_left(self._seqs, seq)
+        if index < len(self._seqs) and self._seqs[index] == seq:
+            return
+        if len(self._seqs) == self._seqs.maxlen:
+            if index == 0:
+                return
+            self._seqs.popleft()
+            self._frames.popleft()
+            index -= 1
+        self._seqs.insert(index, seq)
+        self._frames.insert(index, frame)
+
+    def covers(self, seq: int) -> bool:
+        """Whether every frame after `seq` is here, i.e. none predates what this node saw."""
+        return bool(self._seqs) and self._seqs[0] <= seq + 1
+
+    def after(self, seq: int) -> Frames:
+        start = bisect.bisect_right(self._seqs, seq)
+        return [(self._seqs[i], self._frames[i]) for i in range(start, len(self._seqs))]
+
+
+async def last_stored_seq(room_id: str) -> int:
+    async with AsyncSessionLocal() as db:
+        return await db.scalar(select(func.coalesce(func.max(Message.seq), 0)).where(Message.room_id == room_id))
+
+
+async def load_frames(room_id: str, since_seq: int, limit: int = settings.CHAT_REPLAY_MAX) -> Frames:
+    """Stored frames after `since_seq`; the newest `limit` when more are missing.
+
+    In that case the frames start with a `gap_frame` for the skipped ones.
+    """
+    async with AsyncSessionLocal() as db:
+        rows = (
+            await db.execute(
+                select(Message.seq, User.username, Message.content)
+                .outerjoin(User, Message.sender_id == User.id)
+                .where(Message.room_id == room_id, Message.seq > since_seq)
+                .order_by(Message.seq.desc())
+                .limit(limit)
+            )
+        ).all()
+    frames: Frames = [(seq, encode_frame(seq, f"{username}: {content}")) for seq, username, content in reversed(rows)]
+    if len(rows) == limit and frames[0][0] > since_seq + 1:
+        frames.insert(0, (None, gap_frame(room_id, since_seq, frames[0][0])))
+    return frames
+
+
+class Sequencer(ABC):
+    """Hands out per-room message sequence numbers, continuing from the stored ones."""
+
+    @abstractmethod
+    async def next(self, room_id: str) -> int:
+        ...
+
+
+class InProcessSequencer(Sequencer):
+    """Single-worker backend, paired with the in-process broker.
+
+    Counters are never evicted: re-seeding from the database could reuse
+    numbers of messages the writer has not stored yet.
+    """
+
+    def __init__(self):
+        self._last: Dict[str, int] = {}
+
+    async def next(self, room_id: str) -> int:
+        if room_id not in self._last:
+            seed = await last_stored_seq(room_id)
+            self._last.setdefault(room_id, seed)
+        self._last[room_id] += 1
+        return self._last[room_id]
+
+
+class RedisSequencer(Sequencer):
+    """Counters shared by every node through INCR, seeded from the database when missing."""
+
+    SCRIPT = """
+    if redis.call('EXISTS', KEYS[1]) == 0 then
+        if ARGV[1] == '' then
+            return false
+        end
+        redis.call('SET', KEYS[1], ARGV[1])
+    end
+    return redis.call('INCR', KEYS[1])
+    """
+
+    def __init__(self, client, prefix: str = "chat:seq"):
+        self.prefix = prefix
+        self._script = client.register_script(self.SCRIPT)
+
+    async def next(self, room_id: str) -> int:
+        key = f"{self.prefix}:{room_id}"
+        seq = await self._script(keys=[key], args=[""])
+        if seq is None:
+            seq = await self._script(keys=[key], args=[await last_stored_seq(room_id)])
+        return int(seq)
+
+
+def create_sequencer() -> Sequencer:
+    if settings.CHAT_BROKER == "redis":
+        from redis_pool import redis_pool
+
+        return RedisSequencer(redis_pool.client)
+    return InProcessSequencer()
@@ -1,13 +1,21 @@
-from typing import Dict, List, Optional
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect, Depends
+import asyncio
+import logging
+from typing import Dict, List, Optional, Tuple
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
 from fastapi.responses import HTMLResponse
 from sqlalchemy import func
 from auth.jwt_handler import verify_token
-from sqlalchemy.orm import Session
 from jose import JWTError
 
-from database import get_db
-from models import Message, Room, User, UserRoom
+from config import settings
+from database import AsyncSessionLocal
+from models import Room, User, UserRoom
+from .broker import Broker, create_broker
+from .fanout import BackpressurePolicy, SocketSender
+from .message_writer import message_writer
+from .replay import ReplayBuffer, Sequencer, create_sequencer, decode_frame, encode_frame, load_frames
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -58,56 +66,200 @@ html = """
 
 
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: Dict[str, List[WebSocket]] = {}
+    def __init__(
+        self,
+        max_queue: int = settings.WS_SEND_QUEUE_SIZE,
+        policy: BackpressurePolicy = BackpressurePolicy(settings.WS_BACKPRESSURE_POLICY),
+        send_timeout: float = settings.WS_SEND_TIMEOUT_SECONDS,
+        max_coalesced_bytes: int = settings.WS_MAX_COALESCED_BYTES,
+        broker: Optional[Broker] = None,
+        sequencer: Optional[Sequencer] = None,
+    ):
+        self.broker = broker or create_broker()
+        self.sequencer = sequencer or create_sequencer()
+        self._broker_started = False
+        self.max_queue = max_queue
+        self.policy = policy
+        self.send_timeout = send_timeout
+        self.max_coalesced_bytes = max_coalesced_bytes
+        self.active_connections: Dict[str, Dict[WebSocket, SocketSender]] = {}
+        # Sockets that asked for replay get JSON frames with sequence numbers
+        self.sequenced: Dict[WebSocket, bool] = {}
+        # Recent frames of rooms with local sockets, for replay on reconnect
+        self.buffers: Dict[str, ReplayBuffer] = {}
+        # Live frames held back from sockets whose replay is still being read
+        self._held: Dict[WebSocket, List[Tuple[Optional[int], str]]] = {}
+
+    async def start(self):
+        if not self._broker_started:
+            self._broker_started = True
+            await self.broker.start(self.deliver)
 
-    async def connect(self, websocket: WebSocket, room_id: str):
+    async def stop(self):
+        for room in list(self.active_connections.values()):
+            for sender in list(room.values()):
+                await sender.stop()
+        self.active_connections.clear()
+        self.sequenced.clear()
+        self.buffers.clear()
+        self._held.clear()
+        if self._broker_started:
+            self._broker_started = False
+            await self.broker.stop()
+
+    async def connect(self, websocket: WebSocket, room_id: str, since_seq: Optional[int] = None) -> bool:
+        await self.start()
         await websocket.accept()
         if room_id not in self.active_connections:
-            self.active_connections[room_id] = []
-        self.active_connections[room_id].append(websocket)
+            await self.broker.join(room_id)
+        if since_seq is None:
+            self.register(websocket, room_id)
+            return True
+
+        # Live frames arriving during the replay are held, then queued after it without duplicates
+        self.sequenced[websocket] = True
+        self._held[websocket] = []
+        sender = self.register(websocket, room_id)
+        try:
+            frames = await self.replay(room_id, since_seq)
+            # Sent directly: a long gap would overflow the live send queue
+            for _, frame in frames:
+                await asyncio.wait_for(websocket.send_text(frame), self.send_timeout)
+        except Exception as e:
+            logger.info("Replay to websocket in room %s failed: %r", room_id, e)
+            await self.disconnect(websocket, room_id)
+            try:
+                await websocket.close(code=1011)
+            except Exception:
+                pass
+            return False
+        held = self._held.pop(websocket, [])
+        last_seq = frames[-1][0] if frames else since_seq
+        for seq, frame in held:
+            if seq is None or seq > last_seq:
+                sender.offer(frame)
+        return True
+
+    async def replay(self, room_id: str, since_seq: int) -> List[Tuple[int, str]]:
+        buffer = self.buffers.get(room_id)
+        if buffer and buffer.covers(since_seq):
+            return buffer.after(since_seq)
+        # The buffer does not reach back far enough: read the gap from the database, then top up
+        # with frames this node received that the message writer may not have stored yet
+        frames = await load_frames(room_id, since_seq)
+        buffer = self.buffers.get(room_id)
+        if buffer:
+            frames.extend(buffer.after(frames[-1][0] if frames else since_seq))
+        return frames
+
+    def register(self, websocket: WebSocket, room_id: str) -> SocketSender:
+        sender = SocketSender(
+            websocket,
+            max_queue=self.max_queue,
+            policy=self.policy,
+            send_timeout=self.send_timeout,
+            max_coalesced_bytes=self.max_coalesced_bytes,
+            on_close=lambda s: self._forget(s.websocket, room_id),
+            json_frames=self.sequenced.get(websocket, False),
+        )
+        self.active_connections.setdefault(room_id, {})[websocket] = sender
+        sender.start()
+        return sender
+
+    def _forget(self, websocket: WebSocket, room_id: str) -> Optional[SocketSender]:
+        room = self.active_connections.get(room_id)
+        if room is None:
+            return None
+        sender = room.pop(websocket, None)
+        self.sequenced.pop(websocket, None)
+        self._held.pop(websocket, None)
+        if not room:
+            del self.active_connections[room_id]
+            asyncio.create_task(self._leave(room_id))
+        return sender
+
+    async def _leave(self, room_id: str):
+        # A socket may have rejoined while this task was pending
+        if room_id not in self.active_connections:
+            # No longer subscribed, so the buffer would miss messages from now on
+            self.buffers.pop(room_id, None)
+            await self.broker.leave(room_id)
 
-    def disconnect(self, websocket: WebSocket, room_id: str):
-        if room_id in self.active_connections:
-            self.active_connections[room_id].remove(websocket)
-            if not self.active_connections[room_id]:
-                del self.active_connections[room_id]
+    async def disconnect(self, websocket: WebSocket, room_id: str):
+        sender = self._forget(websocket, room_id)
+        if sender:
+            await sender.stop()
 
     async def send_personal_message(self, message: str, websocket: WebSocket):
         await websocket.send_text(message)
 
-    async def broadcast(self, room_id: str, message: str):
-        if room_id in self.active_connections:
-            for connection in self.active_connections[room_id]:
-                await connection.send_text(message)
+    async def broadcast(self, room_id: str, message: str, seq: Optional[int] = None):
+        # Goes through the broker so members connected to other workers get it too
+        await self.broker.publish(room_id, encode_frame(seq, message))
+
+    def deliver(self, room_id: str, message: str):
+        # Only enqueues; each socket's writer task does the actual send
+        senders = self.active_connections.get(room_id)
+        if not senders:
+            return
+        seq, text = decode_frame(message)
+        frame = encode_frame(seq, text)
+        if seq is not None:
+            self.buffers.setdefault(room_id, ReplayBuffer()).append(seq, frame)
+        for websocket, sender in list(senders.items()):
+            held = self._held.get(websocket)
+            if held is not None:
+                held.append((seq, frame))
+            elif self.sequenced.get(websocket):
+                sender.offer(frame)
+            else:
+                sender.offer(text)
 
 manager = ConnectionManager()
 
 @router.websocket("/ws/{room_id}/user/{user_id}")
-async def websocket_endpoint(websocket: WebSocket, room_id: str, user_id: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == int(user_id)).first()
-    room = db.query(Room).filter(Room.id == room_id).first()
+async def websocket_endpoint(websocket: WebSocket, room_id: str, user_id: str, since_seq: Optional[int] = None):
+    # With `since_seq` (0 for a first connect) frames are JSON {"seq", "text"} and the
+    # messages after that seq are replayed first; without it frames stay plain text
+    # Short-lived session: a Depends() session would pin a pooled connection for the socket's lifetime
+    async with AsyncSessionLocal() as db:
+        user = await db.get(User, int(user_id))
+        room = await db.get(Room, room_id)
 
     if user is None or room is None:
         await websocket.close(code=1008)
         return
 
-    await manager.connect(websocket, room_id)
+    if not await manager.connect(websocket, room_id, since_seq):
+        return
     try:
         while True:
             data = await websocket.receive_text()
-            
-            # Store message in the database
-            new_message = Message(content=data, sender_id=user.id, room_id=room_id)
-            db.add(new_message)
-            db.commit()
-            db.refresh(new_message)
-
-            # Broadcast message to the room
-            await manager.broadcast(room_id, f"{user.username}: {data}")
+
+            try:
+                seq = await manager.sequencer.next(room_id)
+            except Exception as e:
+                # Still delivered live, just not replayable
+                logger.warning("Could not assign a sequence number in room %s: %r", room_id, e)
+                seq = None
+
+            # Broadcast message to the room; a broker outage loses the live fan-out, not the message
+            try:
+                await manager.broadcast(room_id, f"{user.username}: {data}", seq)
+            except Exception as e:
+                logger.warning("Could not publish a message to room %s: %r", room_id, e)
+
+            # Store message in the database in the background
+            await message_writer.submit(user.id, room_id, data, seq)
     except WebSocketDisconnect:
-        manager.disconnect(websocket, room_id)
-        await manager.broadcast(room_id, f"{user.username} has left the chat")
+        pass
+    finally:
+        # Also on unexpected errors, so the sender and its writer task are not left behind
+        await manager.disconnect(websocket, room_id)
+        try:
+            await manager.broadcast(room_id, f"{user.username} has left the chat")
+        except Exception as e:
+            logger.warning("Could not publish a leave notice to room %s: %r", room_id, e)
 
 
 
@@ -0,0 +1,57 @@
+import asyncio
+
+from calls.analysis_queue import DONE, FAILED, QUEUED, InMemoryAnalysisQueue, RedisAnalysisQueue
+
+
+def test_lost_job_is_requeued_and_eventually_failed(fake_redis):
+    async def run():
+        queue = RedisAnalysisQueue(fake_redis, lease_seconds=0, max_attempts=2)
+        job_id = await queue.enqueue("room")
+        # A worker takes the job and dies without acknowledging it
+        assert await queue.next_job(timeout=1) == job_id
+        assert await queue.next_job(timeout=0.1) is None
+        assert await queue.requeue_expired() == 1
+        requeued = await queue.get_job(job_id)
+
+        assert await queue.next_job(timeout=1) == job_id
+        assert await queue.requeue_expired() == 0
+        return requeued, await queue.get_job(job_id), await queue.enqueue("room")
+
+    requeued, failed, next_job_id = asyncio.run(run())
+    assert requeued["status"] == QUEUED and requeued["attempts"] == "1"
+    assert failed["status"] == FAILED
+    # The dead job no longer blocks the room
+    assert next_job_id != failed["job_id"]
+
+
+def test_acknowledged_job_is_not_requeued(fake_redis):
+    async def run():
+        queue = RedisAnalysisQueue(fake_redis, lease_seconds=0)
+        job_id = await queue.enqueue("room")
+        await queue.next_job(timeout=1)
+        await queue.set_status(job_id, DONE)
+        return await queue.requeue_expired(), await fake_redis.llen(queue.processing_key)
+
+    assert asyncio.run(run()) == (0, 0)
+
+
+def test_refresh_skips_dedupe(fake_redis):
+    async def run():
+        queue = RedisAnalysisQueue(fake_redis)
+        first = await queue.enqueue("room")
+        return first, await queue.enqueue("room"), await queue.enqueue("room", refresh=True)
+
+    first, deduped, refreshed = asyncio.run(run())
+    assert deduped == first
+    assert refreshed != first
+
+
+def test_in_memory_queue_forgets_finished_jobs():
+    async def run():
+        queue = InMemoryAnalysisQueue(ttl=0)
+        job_id = await queue.enqueue("room")
+        assert await queue.enqueue("room") == job_id
+        await queue.set_status(job_id, DONE)
+        return await queue.get_job(job_id), queue.jobs, queue.rooms
+
+    assert asyncio.run(run()) == (None, {}, {})
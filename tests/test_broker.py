@@ -0,0 +1,155 @@
+import asyncio
+
+import fakeredis
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from models import Room, User
+from sockets import socket_routes
+from sockets.broker import Broker, InProcessBroker, RedisBroker
+from sockets.replay import InProcessSequencer
+
+
+class Inbox:
+    def __init__(self):
+        self.messages = []
+        self.arrived = asyncio.Event()
+
+    def __call__(self, room_id, message):
+        self.messages.append((room_id, message))
+        self.arrived.set()
+
+    async def wait_for(self, count, timeout=2):
+        async def wait():
+            while len(self.messages) < count:
+                self.arrived.clear()
+                await self.arrived.wait()
+
+        await asyncio.wait_for(wait(), timeout)
+        return self.messages
+
+
+async def exchange(first: Broker, second: Broker):
+    """Both nodes join room-1, only the first joins room-2; each publishes to both rooms."""
+    first_inbox, second_inbox = Inbox(), Inbox()
+    await first.start(first_inbox)
+    await second.start(second_inbox)
+    await first.join("room-1")
+    await first.join("room-2")
+    await second.join("room-1")
+    await asyncio.sleep(0.05)
+    await first.publish("room-1", "from first")
+    await second.publish("room-1", "from second")
+    await second.publish("room-2", "second to room-2")
+    first_messages = await first_inbox.wait_for(3)
+    second_messages = await second_inbox.wait_for(2)
+    await first.stop()
+    await second.stop()
+    return sorted(first_messages), sorted(second_messages)
+
+
+def redis_nodes():
+    server = fakeredis.FakeServer()
+    return (
+        RedisBroker(fakeredis.FakeAsyncRedis(server=server, decode_responses=True)),
+        RedisBroker(fakeredis.FakeAsyncRedis(server=server, decode_responses=True)),
+    )
+
+
+def test_redis_nodes_deliver_to_each_other():
+    first, second = asyncio.run(exchange(*redis_nodes()))
+    assert first == [("room-1", "from first"), ("room-1", "from second"), ("room-2", "second to room-2")]
+    # The second node never joined room-2, so it does not receive its traffic
+    assert second == [("room-1", "from first"), ("room-1", "from second")]
+
+
+def test_in_process_broker_matches_redis_for_a_single_node():
+    async def run(broker):
+        inbox = Inbox()
+        await broker.start(inbox)
+        await broker.join("room-1")
+        await asyncio.sleep(0.05)
+        await broker.publish("room-1", "hello")
+        messages = await inbox.wait_for(1)
+        await broker.stop()
+        return messages
+
+    redis_broker, _ = redis_nodes()
+    assert asyncio.run(run(InProcessBroker())) == asyncio.run(run(redis_broker)) == [("room-1", "hello")]
+
+
+def test_redis_broker_resubscribes_after_losing_its_connection():
+    async def run():
+        node, publisher = redis_nodes()
+        inbox = Inbox()
+        await node.start(inbox)
+        await node.join("room-1")
+
+        # The next read fails as if Redis had dropped the connection
+        lost_pubsub = node._subscription._pubsub
+        get_message = lost_pubsub.get_message
+
+        async def broken_get_message(*args, **kwargs):
+            lost_pubsub.get_message = get_message
+            raise ConnectionError("connection reset")
+
+        lost_pubsub.get_message = broken_get_message
+        for _ in range(50):
+            await asyncio.sleep(0.05)
+            if node._subscription._pubsub is not lost_pubsub:
+                break
+        await asyncio.sleep(0.05)
+        await publisher.publish("room-1", "after reconnect")
+        messages = await inbox.wait_for(1)
+        await node.stop()
+        return messages
+
+    messages = asyncio.run(run())
+    assert messages == [("room-1", "after reconnect")]
+
+
+class FailingBroker(InProcessBroker):
+    async def publish(self, room_id, message):
+        raise ConnectionError("redis is down")
+
+
+class RecordingWriter:
+    def __init__(self):
+        self.rows = []
+
+    async def submit(self, sender_id, room_id, content, seq=None):
+        self.rows.append((sender_id, room_id, content, seq))
+
+
+@pytest.fixture
+def chat_app(monkeypatch, sqlite_sessions):
+    async def seed():
+        async with sqlite_sessions() as db:
+            db.add(User(id=1, username="ann", email="ann@example.com", hashed_password="x"))
+            db.add(Room(id="room-1", is_group=True))
+            await db.commit()
+
+    asyncio.run(seed())
+
+    async def next_seq(room_id):
+        return 1
+
+    manager = socket_routes.ConnectionManager(broker=FailingBroker(), sequencer=InProcessSequencer())
+    monkeypatch.setattr(manager.sequencer, "next", next_seq)
+    writer = RecordingWriter()
+    monkeypatch.setattr(socket_routes, "AsyncSessionLocal", sqlite_sessions)
+    monkeypatch.setattr(socket_routes, "manager", manager)
+    monkeypatch.setattr(socket_routes, "message_writer", writer)
+    app = FastAPI()
+    app.include_router(socket_routes.router)
+    return TestClient(app), manager, writer
+
+
+def test_publish_failure_keeps_the_socket_and_stores_the_message(chat_app):
+    client, manager, writer = chat_app
+    with client.websocket_connect("/ws/room-1/user/1") as websocket:
+        websocket.send_text("first")
+        websocket.send_text("second")
+    assert [row[2] for row in writer.rows] == ["first", "second"]
+    assert manager.active_connections == {}
@@ -0,0 +1,35 @@
+import asyncio
+
+from cache import Cache, CacheInvalidations
+
+
+def test_delete_reaches_other_workers_local_layer(fake_redis):
+    async def scenario():
+        # Two workers' caches: each has its own in-process layer
+        writer = Cache("principal-test", ttl=60, use_redis=True)
+        reader = Cache("principal-test", ttl=60, use_redis=True)
+        invalidations = CacheInvalidations(fake_redis)
+        await invalidations.start()
+        try:
+            await writer.set("uid:1", {"username": "old"})
+            reader.local.set("uid:1", {"username": "old"})
+
+            writer.invalidate("uid:1")
+            for _ in range(50):
+                if reader.local.get("uid:1") is None:
+                    break
+                await asyncio.sleep(0.02)
+
+            assert reader.local.get("uid:1") is None
+            assert await reader.get("uid:1") is None
+        finally:
+            await invalidations.stop()
+
+    asyncio.run(scenario())
+
+
+def test_malformed_invalidation_is_ignored():
+    cache = Cache("principal-test", ttl=60, use_redis=False)
+    cache.local.set("uid:1", "kept")
+    CacheInvalidations(None).apply("not json")
+    assert cache.local.get("uid:1") == "kept"
@@ -0,0 +1,16 @@
+from calls.call_routes import content_disposition
+
+
+def test_plain_name():
+    assert content_disposition("talk.mp4") == "inline; filename=\"talk.mp4\"; filename*=UTF-8''talk.mp4"
+
+
+def test_quotes_and_newlines_cannot_break_the_header():
+    header = content_disposition('a"b\r\nSet-Cookie: x.mp4')
+    assert "\r" not in header and "\n" not in header
+    assert header.startswith('inline; filename="a_b__Set-Cookie: x.mp4";')
+    assert header.endswith("filename*=UTF-8''a%22b%0D%0ASet-Cookie%3A%20x.mp4")
+
+
+def test_non_ascii_name():
+    assert content_disposition("réunion.mp4").endswith("filename*=UTF-8''r%C3%A9union.mp4")
@@ -0,0 +1,60 @@
+import asyncio
+import json
+
+from sockets.fanout import RESYNC_NOTICE, BackpressurePolicy, SocketSender
+
+
+class StalledSocket:
+    """Accepts nothing until released, so offered frames pile up in the queue."""
+
+    def __init__(self):
+        self.sent = []
+        self.release = asyncio.Event()
+
+    async def send_text(self, text):
+        await self.release.wait()
+        self.sent.append(text)
+
+    async def close(self, code=1000):
+        pass
+
+
+def frame(seq):
+    return json.dumps({"seq": seq, "text": f"ann: {seq}"})
+
+
+async def drain(policy, frames, json_frames=True, max_queue=3):
+    socket = StalledSocket()
+    sender = SocketSender(
+        socket, max_queue=max_queue, policy=policy, send_timeout=5, max_coalesced_bytes=10_000, json_frames=json_frames
+    )
+    sender.start()
+    sender.offer(frames[0])
+    await asyncio.sleep(0)  # The writer takes the first frame and stalls on it
+    for message in frames[1:]:
+        sender.offer(message)
+    socket.release.set()
+    await asyncio.sleep(0.05)
+    await sender.stop()
+    return socket.sent, sender
+
+
+def test_coalesced_json_frames_stay_valid_json():
+    sent, _ = asyncio.run(drain(BackpressurePolicy.COALESCE, [frame(seq) for seq in range(1, 9)]))
+    assert json.loads(sent[0])["seq"] == 1
+    merged = json.loads(sent[1])
+    assert [item["seq"] for item in merged] == list(range(2, 9))
+
+
+def test_coalesced_plain_frames_are_joined_by_newlines():
+    sent, _ = asyncio.run(drain(BackpressurePolicy.COALESCE, ["a", "b", "c", "d", "e"], json_frames=False))
+    assert sent == ["a", "b\nc\nd\ne"]
+
+
+def test_dropping_json_frames_sends_a_resync_notice():
+    sent, sender = asyncio.run(drain(BackpressurePolicy.DROP_OLDEST, [frame(seq) for seq in range(1, 9)]))
+    seqs = [json.loads(text)["seq"] for text in sent]
+    assert RESYNC_NOTICE in sent
+    # Everything after the notice is newer than what was dropped
+    assert seqs[0] == 1 and seqs == [1, None, *seqs[2:]]
+    assert sender.dropped + len(sent) - 1 == 8
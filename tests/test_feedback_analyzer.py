@@ -0,0 +1,140 @@
+import asyncio
+import time
+
+import groq
+import pytest
+from aiohttp import web
+
+from calls import analysis
+from calls.analysis import FeedbackAnalyzer
+
+
+class FakeLLM:
+    """Local stand-in for the Groq chat completions API.
+
+    `failures` lists status codes to answer with before succeeding; the
+    reply echoes the question, after `delays[question]` seconds.
+    """
+
+    def __init__(self, failures=(), delays=None):
+        self.failures = list(failures)
+        self.delays = delays or {}
+        self.requests = []
+        self.in_flight = self.max_in_flight = 0
+
+    async def completions(self, request):
+        body = await request.json()
+        prompt = body["messages"][0]["content"]
+        question = prompt.split(" question : ")[-1].split(", User_answer:")[0]
+        self.requests.append((time.monotonic(), question))
+        if self.failures:
+            status = self.failures.pop(0)
+            return web.json_response({"error": {"message": "fake failure", "type": "fake"}}, status=status)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(question, 0.01))
+        finally:
+            self.in_flight -= 1
+        return web.json_response({
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body["model"],
+            "choices": [
+                {"index": 0, "message": {"role": "assistant", "content": f"feedback on {question}"}, "finish_reason": "stop"}
+            ],
+        })
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_post("/openai/v1/chat/completions", self.completions)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.client = groq.AsyncGroq(api_key="test", base_url=f"http://127.0.0.1:{port}", max_retries=0)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.client.close()
+        await self._runner.cleanup()
+
+
+@pytest.fixture(autouse=True)
+def no_jitter(monkeypatch):
+    # Shortest backoff: 0.25s, 0.5s, ...
+    monkeypatch.setattr(analysis.random, "random", lambda: 0.0)
+
+
+def make_analyzer(llm, **kwargs):
+    kwargs.setdefault("rate_per_second", 100)
+    return FeedbackAnalyzer(model="test-model", client=llm.client, **kwargs)
+
+
+def test_transient_errors_are_retried():
+    async def run():
+        async with FakeLLM(failures=[429, 500]) as llm:
+            feedback = await make_analyzer(llm, max_retries=3).feedback("q1", "a1")
+            return feedback, len(llm.requests)
+
+    assert asyncio.run(run()) == ("feedback on q1", 3)
+
+
+def test_gives_up_after_max_retries():
+    async def run():
+        async with FakeLLM(failures=[503, 503, 503]) as llm:
+            with pytest.raises(groq.InternalServerError):
+                await make_analyzer(llm, max_retries=1).feedback("q1", "a1")
+            return len(llm.requests)
+
+    assert asyncio.run(run()) == 2
+
+
+def test_client_errors_are_not_retried():
+    async def run():
+        async with FakeLLM(failures=[400]) as llm:
+            with pytest.raises(groq.BadRequestError):
+                await make_analyzer(llm, max_retries=3).feedback("q1", "a1")
+            return len(llm.requests)
+
+    assert asyncio.run(run()) == 1
+
+
+def test_cached_feedback_skips_the_llm():
+    async def run():
+        async with FakeLLM() as llm:
+            analyzer = make_analyzer(llm)
+            first = await analyzer.feedback("q1", "a1")
+            second = await analyzer.feedback("q1", "a1")
+            await analyzer.feedback("q1", "another answer")
+            return first, second, len(llm.requests)
+
+    assert asyncio.run(run()) == ("feedback on q1", "feedback on q1", 2)
+
+
+def test_calls_respect_rate_and_concurrency_limits():
+    async def run():
+        async with FakeLLM() as llm:
+            analyzer = make_analyzer(llm, rate_per_second=10, concurrency=2)
+            await asyncio.gather(*(analyzer.feedback(f"q{i}", "a") for i in range(14)))
+            times = sorted(t for t, _ in llm.requests)
+            return times[-1] - times[0], llm.max_in_flight
+
+    elapsed, max_in_flight = asyncio.run(run())
+    # A burst of 10, then the remaining 4 at 10 per second
+    assert elapsed >= 0.35
+    assert max_in_flight <= 2
+
+
+def test_stream_yields_in_completion_order():
+    async def pairs():
+        for i in range(3):
+            yield f"q{i}", f"a{i}"
+
+    async def run():
+        async with FakeLLM(delays={"q0": 0.3, "q1": 0.01, "q2": 0.15}) as llm:
+            return [(position, record["feedback"]) async for position, record in make_analyzer(llm).stream(pairs())]
+
+    assert asyncio.run(run()) == [(1, "feedback on q1"), (2, "feedback on q2"), (0, "feedback on q0")]
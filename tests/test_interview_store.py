@@ -0,0 +1,69 @@
+import asyncio
+import json
+import time
+
+from calls.interview_store import InterviewStore
+
+
+def interview(user_id="7", title="Backend"):
+    return {"user_id": user_id, "interview_title": title, "description": "APIs", "duration": "30", "difficulty": "medium"}
+
+
+def test_save_and_latest(fake_redis):
+    async def run():
+        store = InterviewStore(fake_redis)
+        saved = await store.save(interview())
+        return saved, await store.latest("7"), await store.latest("8")
+
+    saved, latest, missing = asyncio.run(run())
+    assert latest == saved
+    assert latest["interview_title"] == "Backend"
+    assert missing is None
+
+
+def test_keys_expire_after_ttl(fake_redis):
+    async def run():
+        store = InterviewStore(fake_redis, ttl=600)
+        saved = await store.save(interview())
+        return (
+            await fake_redis.ttl(f"interview:request:{saved['request_id']}"),
+            await fake_redis.ttl("interview:user:7"),
+        )
+
+    request_ttl, user_ttl = asyncio.run(run())
+    assert 0 < request_ttl <= 600
+    assert 0 < user_ttl <= 600
+
+
+def test_history_is_newest_first_and_trimmed(fake_redis):
+    async def run():
+        store = InterviewStore(fake_redis, max_history=3)
+        # Explicit creation times, so the order does not depend on clock resolution
+        started = time.time()
+        for n in range(5):
+            await store.save(interview(title=f"round {n}"), created_at=started + n)
+        return await store.history("7", 10), await fake_redis.keys("interview:request:*")
+
+    history, request_keys = asyncio.run(run())
+    assert [record["interview_title"] for record in history] == ["round 4", "round 3", "round 2"]
+    assert len(request_keys) == 3
+
+
+def test_legacy_requests_are_migrated_once(fake_redis):
+    async def run():
+        store = InterviewStore(fake_redis)
+        await fake_redis.set("user:7", json.dumps(interview(title="legacy")))
+        await fake_redis.set("user:notes", "not json")
+        newer = await store.save(interview(title="after deploy"))
+        moved = await store.migrate_legacy()
+        again = await store.migrate_legacy()
+        history = await store.history("7", 10)
+        return moved, again, newer, history, await fake_redis.get("user:7"), await fake_redis.get("user:notes")
+
+    moved, again, newer, history, legacy_key, unrelated = asyncio.run(run())
+    assert (moved, again) == (1, 0)
+    # The legacy request predates anything saved under the new layout
+    assert [record["interview_title"] for record in history] == ["after deploy", "legacy"]
+    assert history[0]["request_id"] == newer["request_id"]
+    assert legacy_key is None
+    assert unrelated == "not json"
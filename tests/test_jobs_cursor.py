@@ -0,0 +1,12 @@
+from datetime import datetime, timezone
+
+from jobs.jobs_router import decode_cursor, encode_cursor
+
+
+def test_cursor_round_trips_missing_posted_at():
+    assert decode_cursor(encode_cursor(None, "job-1"), "posted_at") == (None, "job-1")
+
+
+def test_cursor_round_trips_posted_at():
+    posted_at = datetime(2024, 5, 1, 12, 30, tzinfo=timezone.utc)
+    assert decode_cursor(encode_cursor(posted_at, "job-2"), "posted_at") == (posted_at, "job-2")
@@ -0,0 +1,68 @@
+import threading
+import time
+
+from matching.engine import MatchingEngine
+
+PROFILES = [(1, 10, ["python", "sql"])]
+JOBS = [("job-1", "Backend developer", "python and sql")]
+
+
+class Snapshot:
+    """Stands in for a Session: answers the profile query, then the job query."""
+
+    def __init__(self, profiles, jobs, before_jobs=None):
+        self.results = [profiles, jobs]
+        self.before_jobs = before_jobs
+
+    def execute(self, statement):
+        if len(self.results) == 1 and self.before_jobs:
+            self.before_jobs()
+        return self.results.pop(0)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_changes_during_reload_survive_the_swap():
+    engine = MatchingEngine()
+    engine.load(PROFILES, JOBS)
+
+    # A job is posted after the reload read profiles but before it read jobs
+    def concurrent_write():
+        engine.upsert_job("job-2", "Data engineer", "sql")
+
+    engine.load_from_db(Snapshot(PROFILES, JOBS, before_jobs=concurrent_write))
+
+    assert {match["job_id"] for match in engine.jobs_for_profile(1, 10)} == {"job-1", "job-2"}
+
+
+def test_stale_reload_runs_in_background():
+    release = threading.Event()
+    sessions = []
+
+    def session_factory():
+        sessions.append(Snapshot(PROFILES, JOBS + [("job-2", "Data engineer", "sql")], before_jobs=release.wait))
+        return sessions[-1]
+
+    engine = MatchingEngine(refresh_seconds=0, session_factory=session_factory)
+    engine.load(PROFILES, JOBS)
+
+    started = time.monotonic()
+    engine.ensure_loaded(db=None)
+    assert time.monotonic() - started < 1
+    # Still answered from the current matrices while the reload waits
+    assert [match["job_id"] for match in engine.jobs_for_profile(1, 10)] == ["job-1"]
+
+    release.set()
+    assert wait_for(lambda: len(engine.jobs_for_profile(1, 10)) == 2)
+    assert len(sessions) == 1
@@ -0,0 +1,57 @@
+import asyncio
+import json
+
+from sqlalchemy import select
+
+from models import Message, Room, User
+from sockets.message_writer import MessageWriter
+
+
+async def seed(sessions):
+    async with sessions() as db:
+        db.add(User(id=1, username="ann", email="ann@example.com", hashed_password="x"))
+        db.add(Room(id="room", is_group=True))
+        await db.commit()
+
+
+def test_poison_row_is_dead_lettered_and_the_rest_stored(sqlite_sessions, fake_redis):
+    async def run():
+        await seed(sqlite_sessions)
+        writer = MessageWriter(flush_interval=0.05, session_factory=sqlite_sessions)
+        await writer.submit(1, "room", "before")
+        await writer.submit(1, "room", None)  # content is NOT NULL
+        await writer.submit(1, "room", "after")
+        await writer.stop()
+
+        async with sqlite_sessions() as db:
+            stored = (await db.scalars(select(Message.content).order_by(Message.id))).all()
+        dead = [json.loads(entry) for entry in await fake_redis.lrange("chat:dead_letter", 0, -1)]
+        return stored, dead
+
+    stored, dead = asyncio.run(run())
+    assert stored == ["before", "after"]
+    assert len(dead) == 1
+    assert dead[0]["row"]["content"] is None
+    assert "IntegrityError" in dead[0]["error"]
+
+
+def test_transient_errors_are_retried(sqlite_sessions, fake_redis):
+    class FlakyWriter(MessageWriter):
+        failures = 2
+
+        async def _insert(self, batch):
+            if self.failures:
+                self.failures -= 1
+                raise ConnectionResetError("connection lost")
+            return await super()._insert(batch)
+
+    async def run():
+        await seed(sqlite_sessions)
+        writer = FlakyWriter(flush_interval=0.01, session_factory=sqlite_sessions)
+        await writer.submit(1, "room", "hello")
+        await asyncio.sleep(0.5)
+        await writer.stop()
+        async with sqlite_sessions() as db:
+            return (await db.scalars(select(Message.content))).all()
+
+    assert asyncio.run(run()) == ["hello"]
@@ -0,0 +1,30 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from calls import call_routes
+
+
+@pytest.fixture
+def client(monkeypatch, calls_client):
+    async def presign_many(bucket, keys, expires_in=None):
+        return {key: (f"https://storage/{key}", datetime(2030, 1, 1, tzinfo=timezone.utc)) for key in keys}
+
+    monkeypatch.setattr(call_routes, "presign_many", presign_many)
+    return calls_client
+
+
+def test_signs_keys_of_member_rooms(client):
+    response = client.post("/calls/presign", json={"keys": ["mine/call.mp4"]})
+    assert response.status_code == 200
+    assert [item["key"] for item in response.json()] == ["mine/call.mp4"]
+
+
+def test_rejects_rooms_the_caller_is_not_in(client):
+    response = client.post("/calls/presign", json={"keys": ["mine/call.mp4", "theirs/call.mp4"]})
+    assert response.status_code == 403
+
+
+@pytest.mark.parametrize("key", ["/mine/call.mp4", "mine/../theirs/call.mp4", "mine", "mine/", "mine\\call.mp4"])
+def test_rejects_keys_outside_a_room_prefix(client, key):
+    assert client.post("/calls/presign", json={"keys": [key]}).status_code == 400
@@ -0,0 +1,30 @@
+import asyncio
+import json
+
+from models import Message, Room, User
+from sockets import replay
+
+
+def load(monkeypatch, sqlite_sessions, since_seq, limit):
+    monkeypatch.setattr(replay, "AsyncSessionLocal", sqlite_sessions)
+
+    async def run():
+        async with sqlite_sessions() as db:
+            db.add_all([User(id=1, username="ada"), Room(id="room")])
+            await db.flush()
+            db.add_all([Message(sender_id=1, room_id="room", content=f"m{seq}", seq=seq) for seq in range(1, 11)])
+            await db.commit()
+        return await replay.load_frames("room", since_seq, limit)
+
+    return asyncio.run(run())
+
+
+def test_gap_beyond_replay_max_is_announced(monkeypatch, sqlite_sessions):
+    frames = load(monkeypatch, sqlite_sessions, since_seq=2, limit=3)
+    assert [seq for seq, _ in frames] == [None, 8, 9, 10]
+    assert json.loads(frames[0][1])["gap"] == {"after_seq": 2, "before_seq": 8}
+
+
+def test_complete_replay_has_no_gap_notice(monkeypatch, sqlite_sessions):
+    frames = load(monkeypatch, sqlite_sessions, since_seq=7, limit=3)
+    assert [seq for seq, _ in frames] == [8, 9, 10]
@@ -0,0 +1,37 @@
+import io
+
+import pytest
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
+from calls import call_routes
+
+BODY = b"recording bytes"
+
+
+@pytest.fixture
+def client(monkeypatch, calls_client):
+    async def get_object(bucket, key, byte_range=None):
+        if byte_range == "bytes=100-":
+            error = {"Error": {"Code": "InvalidRange", "ActualObjectSize": str(len(BODY))}}
+            raise ClientError(error, "GetObject")
+        return {"Body": StreamingBody(io.BytesIO(BODY), len(BODY)), "ContentLength": len(BODY), "ContentType": "video/mp4"}
+
+    monkeypatch.setattr(call_routes, "get_object", get_object)
+    return calls_client
+
+
+def test_member_downloads_recording(client):
+    response = client.get("/calls/mine/files/call.mp4")
+    assert response.status_code == 200
+    assert response.content == BODY
+
+
+def test_non_member_gets_not_found(client):
+    assert client.get("/calls/theirs/files/call.mp4").status_code == 404
+
+
+def test_unsatisfiable_range_reports_size(client):
+    response = client.get("/calls/mine/files/call.mp4", headers={"Range": "bytes=100-"})
+    assert response.status_code == 416
+    assert response.headers["Content-Range"] == f"bytes */{len(BODY)}"
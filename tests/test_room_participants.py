@@ -0,0 +1,52 @@
+import pytest
+
+from models import Room
+from rooms import room_router
+
+
+class OneRoomSession:
+    def __init__(self, room):
+        self.room = room
+        self.committed = False
+        self.statements = []
+
+    def execute(self, statement):
+        self.statements.append(statement)
+
+    def get(self, model, room_id):
+        return self.room if room_id == self.room.id else None
+
+    def commit(self):
+        self.committed = True
+
+
+@pytest.fixture
+def dm_room(monkeypatch):
+    # Membership rows need Postgres; only the room bookkeeping is checked here
+    monkeypatch.setattr(room_router, "require_users", lambda user_ids, db: None)
+    monkeypatch.setattr(room_router, "add_memberships", lambda room_id, user_ids, db: None)
+    return Room(id="dm", is_group=False, min_user_id=1, max_user_id=2)
+
+
+def test_third_member_turns_dm_into_group(dm_room):
+    db = OneRoomSession(dm_room)
+    room_router.add_participants("dm", [2, 3], db)
+    assert db.committed
+    assert (dm_room.min_user_id, dm_room.max_user_id, dm_room.is_group) == (None, None, True)
+
+
+def test_re_adding_dm_members_keeps_pair(dm_room):
+    room_router.add_participants("dm", [1, 2], OneRoomSession(dm_room))
+    assert (dm_room.min_user_id, dm_room.max_user_id, dm_room.is_group) == (1, 2, False)
+
+
+def test_leaving_member_releases_dm_pair(dm_room):
+    db = OneRoomSession(dm_room)
+    room_router.remove_participants("dm", [2], db)
+    assert db.committed and db.statements
+    assert (dm_room.min_user_id, dm_room.max_user_id) == (None, None)
+
+
+def test_removing_non_member_keeps_dm_pair(dm_room):
+    room_router.remove_participants("dm", [3], OneRoomSession(dm_room))
+    assert (dm_room.min_user_id, dm_room.max_user_id) == (1, 2)
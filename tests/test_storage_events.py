@@ -0,0 +1,44 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from calls import call_routes
+from calls.analysis_queue import InMemoryAnalysisQueue
+from config import settings
+
+EVENT = {
+    "Records": [
+        {"eventName": "s3:ObjectCreated:Put", "s3": {"bucket": {"name": "calls"}, "object": {"key": "room-1/interview.log"}}}
+    ]
+}
+
+
+def client(monkeypatch, token):
+    async def invalidate_listing(bucket, prefix):
+        pass
+
+    monkeypatch.setattr(settings, "STORAGE_WEBHOOK_TOKEN", token)
+    monkeypatch.setattr(call_routes, "analysis_queue", InMemoryAnalysisQueue())
+    monkeypatch.setattr(call_routes, "invalidate_listing", invalidate_listing)
+    app = FastAPI()
+    app.include_router(call_routes.router, prefix="/calls")
+    return TestClient(app)
+
+
+def test_rejected_without_configured_token(monkeypatch):
+    response = client(monkeypatch, None).post("/calls/storage-events", json=EVENT)
+    assert response.status_code == 503
+
+
+def test_rejected_with_wrong_token(monkeypatch):
+    response = client(monkeypatch, "secret").post(
+        "/calls/storage-events", json=EVENT, headers={"Authorization": "Bearer nope"}
+    )
+    assert response.status_code == 401
+
+
+def test_transcript_upload_enqueues_analysis(monkeypatch):
+    response = client(monkeypatch, "secret").post(
+        "/calls/storage-events", json=EVENT, headers={"Authorization": "Bearer secret"}
+    )
+    assert response.status_code == 200
+    assert list(response.json()["jobs"]) == ["room-1"]
@@ -1,23 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy import select
+from sqlalchemy.orm import Session, load_only, noload, selectinload
 from auth.dependencies import get_current_user
 from database import get_db
 from models import User
-from schemas import UserBasicInfo, UserCreate
+from schemas import CurrentUser, UserBasicInfo, UserListItem
 from auth.jwt_handler import verify_token
 
 router = APIRouter()
 
-@router.get("/me", response_model=UserCreate)
-def read_users_me(current_user: UserCreate = Depends(get_current_user)):
+@router.get("/me", response_model=CurrentUser)
+def read_users_me(current_user: CurrentUser = Depends(get_current_user)):
     return current_user
 
 
-@router.get("/", response_model=list[UserBasicInfo])
-def list_users(db: Session = Depends(get_db)):
-    db_users = db.query(User).all()
-    if not db_users:
+@router.get("/", response_model=list[UserListItem])
+def list_users(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    after: Optional[int] = Query(None, description="id of the last user of the previous page"),
+    include_profile: bool = True,
+    db: Session = Depends(get_db),
+):
+    # Keyset pagination on users.id: every page is an index range scan, however deep
+    stmt = select(User).order_by(User.id).limit(limit)
+    if after is not None:
+        stmt = stmt.where(User.id > after)
+    if include_profile:
+        # One extra IN query for the whole page instead of one per user
+        stmt = stmt.options(selectinload(User.job_seeker_profile))
+    else:
+        stmt = stmt.options(load_only(User.id, User.username, User.email), noload(User.job_seeker_profile))
+
+    db_users = db.scalars(stmt).all()
+    if not db_users and after is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No users found")
+    if len(db_users) == limit:
+        response.headers["X-Next-Cursor"] = str(db_users[-1].id)
     return db_users
     
 
@@ -0,0 +1,32 @@
+# Background worker for interview log analysis jobs.
+#
+#     ANALYSIS_QUEUE_BACKEND=redis python worker.py
+#
+# Runs as many processes as needed; each pulls room jobs from the shared Redis
+# queue and writes finished reports to Postgres.
+import asyncio
+import logging
+
+from calls.analysis_queue import analysis_queue, run_worker
+from config import settings
+from database import async_engine
+from redis_pool import redis_pool
+
+
+async def main():
+    if settings.ANALYSIS_QUEUE_BACKEND != "redis":
+        raise SystemExit("worker.py needs ANALYSIS_QUEUE_BACKEND=redis; the memory backend runs inside the API")
+    try:
+        await run_worker(analysis_queue)
+    finally:
+        await analysis_queue.close()
+        await async_engine.dispose()
+        await redis_pool.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass